@@ -0,0 +1,49 @@
+"""Measures how long ``import CAI`` takes in a fresh interpreter.
+
+Each run starts a new Python process with ``-X importtime`` and reads the
+cumulative import time of the modules below from its report. The median over
+all runs is printed, along with which of the heavy optional modules were
+imported at all.
+
+Usage:
+
+    $ python benchmark/import_time.py [runs]
+"""
+
+import statistics
+import subprocess
+import sys
+
+MODULES = ["CAI", "CAI.CAI", "numpy", "Bio.Data.CodonTable", "scipy.stats"]
+
+
+def import_times():
+    """Returns the cumulative import time in ms of every module imported."""
+    report = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import CAI"],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stderr
+
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main(runs=10):
+    results = [import_times() for _ in range(runs)]
+    for module in MODULES:
+        times = [result[module] for result in results if module in result]
+        if times:
+            print(f"{module:<22}{statistics.median(times):>10.1f} ms")
+        else:
+            print(f"{module:<22}{'not imported':>13}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,243 @@
+"""Times the main workloads of CAI and checks them against stored baselines.
+
+Everything runs offline on the reference sets in ``example_seqs`` and
+``benchmark/ecoli.heg.fasta``, plus a synthetic genome of random genes made
+from a fixed seed, so runs on the same machine are comparable. Each workload is
+run several times and the median is reported. Where Biopython's
+``CodonAdaptationIndex`` is available, it is timed on the same inputs for
+comparison.
+
+The results are compared with ``benchmark/baseline.json`` (when it exists) and
+any workload slower than its baseline by more than the threshold is flagged as
+a regression, making the exit status 1. Baselines are machine specific, so
+record new ones with ``--save`` before comparing on a different machine.
+
+Usage:
+
+    $ python benchmark/suite.py [--runs 5] [--genes 5000] [--threshold 0.25]
+    $ python benchmark/suite.py --save
+"""
+
+import argparse
+from glob import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from import_time import import_times
+from CAI import CAI, RSCU, Weights, read_fasta, relative_adaptiveness
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES = sorted(glob(os.path.join(HERE, os.pardir, "example_seqs", "*.heg.fasta")))
+ECOLI = os.path.join(HERE, "ecoli.heg.fasta")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+STOP_CODONS = {"TAA", "TAG", "TGA"}
+SENSE_CODONS = sorted(
+    a + b + c
+    for a in "ACGT"
+    for b in "ACGT"
+    for c in "ACGT"
+    if a + b + c not in STOP_CODONS
+)
+
+
+def synthetic_genome(genes, seed=0):
+    """Makes random genes of 100 to 1000 codons with a start and stop codon."""
+    rng = np.random.RandomState(seed)
+    sense = np.array(SENSE_CODONS)
+    return [
+        "ATG" + "".join(sense[rng.randint(len(sense), size=length)]) + "TAA"
+        for length in rng.randint(100, 1000, size=genes)
+    ]
+
+
+def sequences(path):
+    return [bytes(sequence).decode() for _, sequence in read_fasta(path)]
+
+
+def median_time(function, runs):
+    """Returns the median wall time of calling ``function`` in ms."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def peak_memory(function):
+    """Returns the most memory allocated while calling ``function`` in MB."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def biopython_index():
+    """Returns Biopython's CodonAdaptationIndex class, if it has the modern API."""
+    try:
+        from Bio.SeqUtils import CodonAdaptationIndex
+    except ImportError:  # Biopython before 1.80 only has Bio.SeqUtils.CodonUsage
+        return None
+    return CodonAdaptationIndex
+
+
+def workloads(genome, genome_path):
+    """Yields the name and timed function of each workload.
+
+    Single genes are scored 1000 times over so the timings aren't just noise.
+    """
+    references = [sequences(path) for path in EXAMPLES]
+    ecoli = sequences(ECOLI)
+    weights = Weights(reference=ecoli)
+    weights_dict = weights.to_dict()
+    gene = genome[0]
+    repeats = range(1000)
+
+    yield "RSCU (example reference sets)", lambda: [
+        RSCU(reference) for reference in references
+    ]
+    yield "RSCU (synthetic genome)", lambda: RSCU(genome)
+    yield "weights (E. coli)", lambda: relative_adaptiveness(ecoli)
+    yield "Weights object (E. coli)", lambda: Weights(reference=ecoli)
+    yield "single gene x1000, weights dict", lambda: [
+        CAI(gene, weights=weights_dict) for _ in repeats
+    ]
+    yield "single gene x1000, Weights object", lambda: [
+        weights.score(gene) for _ in repeats
+    ]
+    yield "batch (synthetic genome)", lambda: weights.score_many(genome)
+    yield "CLI end to end", lambda: subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "CAI.cli",
+            "score",
+            "-s",
+            genome_path,
+            "-r",
+            ECOLI,
+            "-o",
+            os.devnull,
+        ],
+        check=True,
+    )
+
+    index = biopython_index()
+    if index is not None:
+        biopython = index(ecoli)
+        yield "Biopython weights (E. coli)", lambda: index(ecoli)
+        yield "Biopython single gene x1000", lambda: [
+            biopython.calculate(gene) for _ in repeats
+        ]
+        yield "Biopython batch (synthetic genome)", lambda: [
+            biopython.calculate(sequence) for sequence in genome
+        ]
+
+
+def run(runs, genes):
+    genome = synthetic_genome(genes)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        genome_path = os.path.join(directory, "genome.fasta")
+        with open(genome_path, "w") as f:
+            for i, sequence in enumerate(genome):
+                f.write(">gene{}\n{}\n".format(i, sequence))
+
+        for name, function in workloads(genome, genome_path):
+            results[name] = (median_time(function, runs), "ms")
+
+        weights = Weights(reference=sequences(ECOLI))
+        results["peak memory, RSCU (synthetic genome)"] = (
+            peak_memory(lambda: RSCU(genome)),
+            "MB",
+        )
+        results["peak memory, batch (synthetic genome)"] = (
+            peak_memory(lambda: weights.score_many(genome)),
+            "MB",
+        )
+
+    imports = [import_times()["CAI"] for _ in range(runs)]
+    results["import CAI"] = (statistics.median(imports), "ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="repeats per workload")
+    parser.add_argument(
+        "--genes", type=int, default=5000, help="genes in the synthetic genome"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="how much slower than the baseline counts as a regression",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    parser.add_argument("--baseline", default=BASELINE, help="the baseline file")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.genes)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored["genes"] == args.genes:
+            baseline = stored["results"]
+        else:
+            print("The baseline used a different number of genes, so is ignored")
+
+    regressions = []
+    print(f"{'workload':<40}{'result':>14}{'baseline':>14}{'change':>10}")
+    for name, (value, unit) in results.items():
+        line = f"{name:<40}{value:>11.2f} {unit:<2}"
+        if name in baseline:
+            previous = baseline[name]["value"]
+            change = value / previous - 1 if previous else 0
+            line += f"{previous:>11.2f} {unit:<2}{change:>+10.0%}"
+            if change > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "genes": args.genes,
+                    "runs": args.runs,
+                    "python": sys.version.split()[0],
+                    "numpy": np.__version__,
+                    "results": {
+                        name: {"value": value, "unit": unit}
+                        for name, (value, unit) in results.items()
+                    },
+                },
+                f,
+                indent=2,
+            )
+        print("Saved the baseline to " + args.baseline)
+
+    if regressions:
+        print(
+            "{} workload(s) regressed by more than {:.0%}".format(
+                len(regressions), args.threshold
+            )
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
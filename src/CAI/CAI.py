@@ -1,7 +1,10 @@
-from itertools import chain
-import Bio.Data.CodonTable as ct
-from scipy.stats import gmean
-from collections import Counter
+from functools import partial
+from itertools import count, product, repeat
+import hashlib
+import json
+import numpy as np
+from .cache import ReferenceCache
+from .instrumentation import profiler
 
 # get rid of Biopython warning
 import warnings
@@ -10,7 +13,31 @@ from Bio import BiopythonWarning
 warnings.simplefilter("ignore", BiopythonWarning)
 
 
-def _synonymous_codons(genetic_code_dict):
+def _genetic_code(genetic_code):
+    """Returns the Biopython codon table with the given ID.
+
+    Importing ``Bio.Data.CodonTable`` builds every table it knows about, so it
+    is only imported once a genetic code is actually needed.
+    """
+    import Bio.Data.CodonTable as ct
+
+    return ct.unambiguous_dna_by_id[genetic_code]
+
+
+class _PerGeneticCode(dict):
+    """A dictionary that builds the entry for each genetic code on first use."""
+
+    def __init__(self, build):
+        super().__init__()
+        self._build = build
+
+    def __missing__(self, genetic_code):
+        self[genetic_code] = self._build(genetic_code)
+        return self[genetic_code]
+
+
+def _find_synonymous_codons(genetic_code):
+    genetic_code_dict = _genetic_code(genetic_code).forward_table
 
     # invert the genetic code dictionary to map each amino acid to its codons
     codons_for_amino_acid = {}
@@ -26,16 +53,325 @@ def _synonymous_codons(genetic_code_dict):
     }
 
 
-_synonymous_codons = {
-    k: _synonymous_codons(v.forward_table) for k, v in ct.unambiguous_dna_by_id.items()
-}
-_non_synonymous_codons = {
-    k: {codon for codon in v.keys() if len(v[codon]) == 1}
-    for k, v in _synonymous_codons.items()
-}
+def _find_non_synonymous_codons(genetic_code):
+    synonymous_codons = _synonymous_codons[genetic_code]
+    return {codon for codon in synonymous_codons if len(synonymous_codons[codon]) == 1}
+
+
+_synonymous_codons = _PerGeneticCode(_find_synonymous_codons)
+_non_synonymous_codons = _PerGeneticCode(_find_non_synonymous_codons)
+
+# every codon gets an index from 0 to 63 in alphabetical order (AAA is 0, TTT
+# is 63) and anything that isn't a plain A, C, G or T codon gets _INVALID
+_CODONS = tuple("".join(codon) for codon in product("ACGT", repeat=3))
+_CODON_INDEX = {codon: i for i, codon in enumerate(_CODONS)}
+_INVALID = len(_CODONS)
+
+# map each byte to the value of its nucleotide (A=0, C=1, G=2, T=3) or 4 if it
+# isn't a nucleotide at all, reading the U of RNA as T
+_NUCLEOTIDES = np.full(256, 4, dtype=np.uint8)
+for _i, _base in enumerate("ACGT"):
+    _NUCLEOTIDES[ord(_base)] = _NUCLEOTIDES[ord(_base.lower())] = _i
+_NUCLEOTIDES[ord("U")] = _NUCLEOTIDES[ord("u")] = 3
+
+# the nucleotide value at each position of each codon index
+_CODON_NUCLEOTIDES = np.array(
+    [[i // 16, i // 4 % 4, i % 4] for i in range(_INVALID)], dtype=np.intp
+)
+
+# map the base five number formed by three nucleotide values to a codon index
+_BASE_FIVE_CODONS = np.full(125, _INVALID, dtype=np.uint8)
+for _i, (_first, _second, _third) in enumerate(product(range(4), repeat=3)):
+    _BASE_FIVE_CODONS[25 * _first + 5 * _second + _third] = _i
+
+
+def _as_bytes(sequence):
+    """Views a sequence as an array of bytes, copying only when it must.
+
+    NumPy arrays of single bytes and anything supporting the buffer protocol
+    (bytes, bytearray, memoryview, mmap, array.array...) are used in place, as
+    is the data behind a Biopython ``Seq``. Strings have to be encoded, which
+    takes a copy.
+    """
+    if isinstance(sequence, str):
+        return np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)
+    if isinstance(sequence, memoryview) and not sequence.c_contiguous:
+        sequence = np.asarray(sequence)
+    if isinstance(sequence, np.ndarray) and sequence.dtype.itemsize == 1:
+        return sequence.view(np.uint8)
+    try:
+        return np.frombuffer(sequence, dtype=np.uint8)
+    except TypeError:
+        pass
+    # Bio.Seq hands over its underlying bytes, anything else becomes a string
+    if hasattr(sequence, "__bytes__"):
+        return np.frombuffer(bytes(sequence), dtype=np.uint8)
+    return np.frombuffer(str(sequence).encode("ascii", "replace"), dtype=np.uint8)
+
+
+def _codon_index(codon):
+    """Returns the index of a codon given as a string or bytes, or None if it isn't one."""
+    if not isinstance(codon, str):
+        codon = bytes(_as_bytes(codon)).decode("ascii", "replace")
+    return _CODON_INDEX.get(codon.upper().replace("U", "T"))
+
+
+def _codon_at(sequence, i):
+    """Returns the ``i`` th codon of a sequence as an uppercase string."""
+    return (
+        bytes(_as_bytes(sequence)[3 * i : 3 * i + 3]).decode("ascii", "replace").upper()
+    )
+
+
+def _encode(sequence):
+    """Converts a sequence into an array of codon indices.
+
+    Codons are indexed as in ``_CODONS``, irrespective of case, with U read as
+    T. Any codon containing something other than A, C, G, T or U (such as N or
+    another ambiguity code) is given the index ``_INVALID``. Trailing nucleotides that don't make up a full codon are
+    ignored.
+
+    Args:
+        sequence (str, bytes or numpy.ndarray): The sequence to encode.
+
+    Returns:
+        numpy.ndarray: A ``uint8`` array with one index per codon.
+    """
+    nucleotides = _NUCLEOTIDES[_as_bytes(sequence)]
+    length = len(nucleotides) - len(nucleotides) % 3
+    return _BASE_FIVE_CODONS[
+        25 * nucleotides[0:length:3]
+        + 5 * nucleotides[1:length:3]
+        + nucleotides[2:length:3]
+    ]
+
+
+# the ways of handling codons that aren't made of A, C, G, T or U
+_AMBIGUOUS_POLICIES = ("error", "skip", "count-as-invalid")
+
+
+def _check_ambiguous(ambiguous):
+    if ambiguous not in _AMBIGUOUS_POLICIES:
+        raise ValueError(
+            "ambiguous must be one of "
+            + ", ".join(repr(policy) for policy in _AMBIGUOUS_POLICIES)
+        )
+
+
+def _ambiguous_codon_message(codon):
+    return (
+        "Ambiguous codon "
+        + codon
+        + ". Use ambiguous='skip' or 'count-as-invalid' to mask such codons."
+    )
+
+
+def _codon_table(genetic_code):
+    """Builds the per-codon lookup arrays used for a genetic code.
+
+    All arrays have one entry per codon index plus a trailing entry for
+    ``_INVALID`` so that they can be indexed directly with encoded sequences.
+    ``amino_acid`` groups synonymous codons together. Codons that don't code for
+    an amino acid are put in an extra group of their own. ``groups`` has a
+    column for each amino acid (named in ``amino_acids``) marking its codons, so
+    multiplying counts by it sums them by amino acid.
+    """
+    forward_table = _genetic_code(genetic_code).forward_table
+    stop_codons = _genetic_code(genetic_code).stop_codons
+    amino_acids = sorted(set(forward_table.values()))
+
+    amino_acid = np.full(_INVALID + 1, len(amino_acids), dtype=np.intp)
+    for codon, aa in forward_table.items():
+        amino_acid[_CODON_INDEX[codon]] = amino_acids.index(aa)
+
+    stop = np.zeros(_INVALID + 1, dtype=bool)
+    stop[[_CODON_INDEX[codon] for codon in stop_codons]] = True
+
+    non_synonymous = np.zeros(_INVALID + 1, dtype=bool)
+    non_synonymous[
+        [_CODON_INDEX[codon] for codon in _non_synonymous_codons[genetic_code]]
+    ] = True
+
+    sense = amino_acid < len(amino_acids)
+    groups = np.zeros((_INVALID + 1, len(amino_acids)))
+    groups[np.flatnonzero(sense), amino_acid[sense]] = 1
+    return {
+        "amino_acids": tuple(amino_acids),
+        "groups": groups,
+        "amino_acid": amino_acid,
+        "sense": sense,
+        "stop": stop,
+        "non_synonymous": non_synonymous,
+        "synonymous": sense & ~non_synonymous,
+    }
+
+
+_codon_tables = _PerGeneticCode(_codon_table)
+
+
+# identifies files written by Weights.save and the version of their layout
+_INDEX_FORMAT = "CAI weights"
+_INDEX_VERSION = 1
+
+# opt-in cache of the RSCUs of reference sets, keyed by their digest
+reference_cache = ReferenceCache()
+
+
+def _digest(sequences):
+    """Hashes the contents of a set of sequences.
+
+    The length of each sequence is hashed before it, so that the same bytes
+    split up into sequences differently give a different digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for sequence in sequences:
+        sequence = np.ascontiguousarray(_as_bytes(sequence))
+        digest.update(len(sequence).to_bytes(8, "little"))
+        digest.update(sequence)
+    return digest.digest()
+
+
+def _count_codons(sequence):
+    """Counts how often each codon index (including ``_INVALID``) occurs."""
+    return np.bincount(_encode(sequence), minlength=_INVALID + 1)
+
+
+def _located(message, index=None, id=None):
+    """Prefixes an error message with the position and ID of the sequence at fault."""
+    location = []
+    if index is not None:
+        location.append("Sequence {}".format(index))
+    if id is not None:
+        location.append("({})".format(id))
+    return " ".join(location) + ": " + message if location else message
+
+
+class InvalidSequenceError(ValueError):
+    """Raised when a sequence is invalid, saying which sequence it is.
+
+    Args:
+        reason (str): What is wrong with the sequence.
+        index (int, optional): The position of the sequence among those given.
+        id (str, optional): The ID of the sequence.
+
+    Attributes:
+        reason (str): What is wrong with the sequence.
+        index (int): The position of the sequence among those given, or None.
+        id (str): The ID of the sequence, or None.
+    """
+
+    def __init__(self, reason, index=None, id=None):
+        super().__init__(_located(reason, index, id))
+        self.reason = reason
+        self.index = index
+        self.id = id
 
+    def __reduce__(self):
+        return (self.__class__, (self.reason, self.index, self.id))
 
-def RSCU(sequences, genetic_code=11):
+
+def _length_problem(length):
+    """Says what is wrong with a sequence of ``length`` nucleotides, if anything."""
+    if not length:
+        return "Input sequence cannot be empty"
+    if length % 3 != 0:
+        return "Input sequence not divisible by three"
+    return None
+
+
+def _count_records(records, skip_invalid=False):
+    """Validates and counts the codons of several records in a single pass.
+
+    Each sequence is checked as it is read and the valid ones are encoded
+    together, so none is gone over twice.
+
+    Args:
+        records (iterable): ``(index, ID, sequence)`` tuples.
+        skip_invalid (bool, optional): Whether to leave invalid sequences out
+            instead of raising an error.
+
+    Returns:
+        tuple: How often each codon index (including ``_INVALID``) occurs and an
+        :class:`InvalidSequenceError` for each sequence that was left out.
+
+    Raises:
+        InvalidSequenceError: When a sequence is invalid and ``skip_invalid`` isn't set.
+    """
+    buffers = []
+    skipped = []
+    for index, id, sequence in records:
+        buffer = _as_bytes(sequence)
+        problem = _length_problem(len(buffer))
+        if problem is not None:
+            error = InvalidSequenceError(problem, index, id)
+            if not skip_invalid:
+                raise error
+            skipped.append(error)
+        else:
+            buffers.append(buffer)
+    if not buffers:
+        return np.zeros(_INVALID + 1, dtype=np.int64), skipped
+    counts = np.bincount(_encode(np.concatenate(buffers)), minlength=_INVALID + 1)
+    return counts.astype(np.int64, copy=False), skipped
+
+
+def _count_matrix(sequences):
+    """Counts how often each codon index occurs in each of several sequences.
+
+    The sequences are encoded together and every count is made with a single
+    ``bincount``, offsetting the codon indices of each sequence by its row.
+
+    Returns:
+        numpy.ndarray: An ``int64`` matrix with a row for each sequence and a
+        column for each codon index (including ``_INVALID``).
+    """
+    buffers = [_as_bytes(sequence) for sequence in sequences]
+    buffers = [buffer[: len(buffer) - len(buffer) % 3] for buffer in buffers]
+    if not buffers:
+        return np.zeros((0, _INVALID + 1), dtype=np.int64)
+
+    lengths = [len(buffer) // 3 for buffer in buffers]
+    rows = np.repeat(np.arange(len(buffers)), lengths)
+    codons = _encode(np.concatenate(buffers))
+    counts = np.bincount(
+        rows * (_INVALID + 1) + codons, minlength=len(buffers) * (_INVALID + 1)
+    )
+    return counts.reshape(len(buffers), _INVALID + 1).astype(np.int64, copy=False)
+
+
+def _RSCU_from_counts(counts, genetic_code):
+    """Calculates the RSCU of each codon from an array of codon counts.
+
+    See :func:`RSCU` for details.
+    """
+    table = _codon_tables[genetic_code]
+
+    # "if a certain codon is never used in the reference set... assign [its
+    # count] a value of 0.5" (page 1285)
+    counts = np.asarray(counts, dtype=float)[:_INVALID]
+    counts = np.where(counts == 0, 0.5, counts)
+
+    # total count and number of codons for each amino acid
+    amino_acid = table["amino_acid"][:_INVALID]
+    totals = np.bincount(amino_acid, weights=counts)[amino_acid]
+    sizes = np.bincount(amino_acid)[amino_acid]
+
+    rscu = counts / ((1.0 / sizes) * totals)
+
+    return {
+        codon: float(rscu[_CODON_INDEX[codon]])
+        for codon in _genetic_code(genetic_code).forward_table
+    }
+
+
+def RSCU(
+    sequences,
+    genetic_code=11,
+    n_jobs=1,
+    ambiguous="count-as-invalid",
+    ids=None,
+    invalid="error",
+):
     r"""Calculates the relative synonymous codon usage (RSCU) for a set of sequences.
 
     RSCU is 'the observed frequency of [a] codon divided by the frequency
@@ -55,12 +391,30 @@ def RSCU(sequences, genetic_code=11):
     Args:
         sequences (list): The reference set of sequences.
         genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        n_jobs (int, optional): The number of processes to count codons with. -1 uses one per CPU. Defaults to 1.
+        ambiguous (str, optional): What to do with codons containing something
+            other than A, C, G, T or U: ``"error"`` raises a ValueError, while
+            ``"skip"`` and ``"count-as-invalid"`` leave them out of the counts.
+            Defaults to ``"count-as-invalid"``.
+        ids (list, optional): The ID of each sequence, to say which one is at
+            fault in errors.
+        invalid (str, optional): What to do with sequences that are empty or not
+            divisible by three: ``"error"`` raises an error and ``"skip"`` leaves
+            them out with a warning tallying them. Defaults to ``"error"``.
 
     Returns:
         dict: The relative synonymous codon usage.
 
     Raises:
-        ValueError: When an invalid sequence is provided or a list is not provided.
+        InvalidSequenceError: When a sequence is invalid, giving its position
+            and ID.
+        ValueError: When a list is not provided.
+
+    Note:
+        When :data:`reference_cache` is enabled, the result is stored and reused
+        for later calls with the same sequences and genetic code. This also
+        applies to :func:`relative_adaptiveness` and :func:`CAI` when they are
+        given reference sequences.
     """
 
     if not isinstance(sequences, (list, tuple)):
@@ -68,44 +422,143 @@ def RSCU(sequences, genetic_code=11):
             "Be sure to pass a list of sequences, not a single sequence. "
             "To find the RSCU of a single sequence, pass it as a one element list."
         )
+    _check_ambiguous(ambiguous)
+    if invalid not in ("error", "skip"):
+        raise ValueError("invalid must be 'error' or 'skip'")
+    if ids is not None and len(ids) != len(sequences):
+        raise ValueError("There must be one ID for each sequence")
 
-    # ensure all input sequences are divisible by three
-    for sequence in sequences:
+    # reuse the result for the same reference set if caching is enabled
+    key = None
+    if reference_cache.enabled:
+        key = (_digest(sequences), genetic_code, ambiguous == "error")
+        result = reference_cache.get(key)
+        if result is not None:
+            return dict(result)
+
+    # validate and count the codons of the sequences in one pass
+    if ids is None:
+        ids = [None] * len(sequences)
+    records = zip(range(len(sequences)), ids, sequences)
+    count = partial(_count_records, skip_invalid=invalid == "skip")
+    with profiler.stage("codon counting", sequences=len(sequences)) as stage:
+        if n_jobs == 1:
+            counts, skipped = count(records)
+        else:
+            from ._parallel import map_chunks
+
+            counts = np.zeros(_INVALID + 1, dtype=np.int64)
+            skipped = []
+            for chunk_counts, chunk_skipped in map_chunks(count, records, n_jobs):
+                counts += chunk_counts
+                skipped += chunk_skipped
+        stage.count(codons=int(counts.sum()))
+
+    if skipped:
+        warnings.warn(
+            "Skipped {} invalid sequence{}: {}".format(
+                len(skipped),
+                "" if len(skipped) == 1 else "s",
+                "; ".join(str(error) for error in skipped[:5])
+                + ("; ..." if len(skipped) > 5 else ""),
+            )
+        )
+
+    # only look for the ambiguous codon once it is known that there is one
+    if ambiguous == "error" and counts[_INVALID]:
+        skipped_indices = {error.index for error in skipped}
+        for index, sequence in enumerate(sequences):
+            if index in skipped_indices:
+                continue
+            codons = _encode(sequence)
+            if (codons == _INVALID).any():
+                raise InvalidSequenceError(
+                    _ambiguous_codon_message(
+                        _codon_at(sequence, int(np.argmax(codons == _INVALID)))
+                    ),
+                    index,
+                    ids[index],
+                )
+
+    with profiler.stage("RSCU"):
+        result = _RSCU_from_counts(counts, genetic_code)
+    # results missing skipped sequences aren't cached, so that a later call
+    # that should fail on them does
+    if key is not None and not skipped:
+        reference_cache.put(key, dict(result))
+    return result
+
+
+class RSCUAccumulator:
+    r"""Counts the codons of a reference set one sequence at a time.
+
+    Only the number of times each codon was seen is kept, so a reference set can
+    be streamed from a file of any size. Accumulators for different parts of a
+    reference set can be combined with :meth:`merge` and :meth:`finalize` gives
+    the same result as calling :func:`RSCU` on all of the sequences.
+
+    Args:
+        sequences (iterable, optional): Sequences to start counting with.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+
+    Attributes:
+        counts (numpy.ndarray): The number of times each codon has been seen, in
+            alphabetical order of the codons.
+        genetic_code (int): The translation table in use.
+    """
+
+    def __init__(self, sequences=(), genetic_code=11):
+        self.genetic_code = genetic_code
+        self.counts = np.zeros(_INVALID, dtype=np.int64)
+        self.update(sequences)
+
+    def __repr__(self):
+        return "RSCUAccumulator(codons={}, genetic_code={})".format(
+            int(self.counts.sum()), self.genetic_code
+        )
+
+    def add(self, sequence):
+        """Counts the codons of one sequence.
+
+        Raises:
+            ValueError: When the sequence is empty or not divisible by three.
+        """
         if len(sequence) % 3 != 0:
             raise ValueError("Input sequence not divisible by three")
-        if not sequence:
+        if not len(sequence):
             raise ValueError("Input sequence cannot be empty")
+        self.counts += _count_codons(sequence)[:_INVALID]
 
-    # count the number of each codon in the sequences
-    sequences = (
-        (sequence[i : i + 3].upper() for i in range(0, len(sequence), 3))
-        for sequence in sequences
-    )
-    codons = chain.from_iterable(
-        sequences
-    )  # flat list of all codons (to be used for counting)
-    counts = Counter(codons)
+    def update(self, sequences):
+        """Counts the codons of every sequence in an iterable.
 
-    # "if a certain codon is never used in the reference set... assign [its
-    # count] a value of 0.5" (page 1285)
-    for codon in ct.unambiguous_dna_by_id[genetic_code].forward_table:
-        if counts[codon] == 0:
-            counts[codon] = 0.5
+        Raises:
+            ValueError: When a sequence is empty or not divisible by three.
+        """
+        for sequence in sequences:
+            self.add(sequence)
 
-    # determine the synonymous codons for the genetic code
-    synonymous_codons = _synonymous_codons[genetic_code]
+    def merge(self, other):
+        """Adds the counts of another accumulator to this one.
 
-    # hold the result as it is being calulated
-    result = {}
+        Returns:
+            RSCUAccumulator: This accumulator, so that merges can be chained.
 
-    # calculate RSCU values
-    for codon in ct.unambiguous_dna_by_id[genetic_code].forward_table:
-        result[codon] = counts[codon] / (
-            (len(synonymous_codons[codon]) ** -1)
-            * (sum((counts[_codon] for _codon in synonymous_codons[codon])))
-        )
+        Raises:
+            ValueError: When the accumulators use different genetic codes.
+        """
+        if other.genetic_code != self.genetic_code:
+            raise ValueError("Cannot merge counts for different genetic codes")
+        self.counts += other.counts
+        return self
 
-    return result
+    def finalize(self):
+        """Calculates the RSCU of all of the sequences counted so far.
+
+        Returns:
+            dict: The relative synonymous codon usage. See :func:`RSCU` for details.
+        """
+        return _RSCU_from_counts(self.counts, self.genetic_code)
 
 
 def relative_adaptiveness(sequences=None, RSCUs=None, genetic_code=11):
@@ -148,20 +601,109 @@ def relative_adaptiveness(sequences=None, RSCUs=None, genetic_code=11):
     if sequences:
         RSCUs = RSCU(sequences, genetic_code=genetic_code)
 
-    # determine the synonymous codons for the genetic code
-    synonymous_codons = _synonymous_codons[genetic_code]
+    with profiler.stage("relative adaptiveness"):
+        # line the RSCUs up by codon index, leaving codons without one as nan
+        table = _codon_tables[genetic_code]
+        for codon in RSCUs:
+            if not table["sense"][_CODON_INDEX[codon]]:
+                raise KeyError(codon)
+        values = np.full(_INVALID + 1, np.nan)
+        values[[_CODON_INDEX[codon] for codon in RSCUs]] = list(RSCUs.values())
+
+        # divide each RSCU by the largest RSCU among its synonymous codons
+        maxima = np.full(table["amino_acid"].max() + 1, np.nan)
+        np.fmax.at(maxima, table["amino_acid"], values)
+        weights = values / maxima[table["amino_acid"]]
+
+        return {codon: float(weights[_CODON_INDEX[codon]]) for codon in RSCUs}
+
+
+def _resolve_weights(weights, RSCUs, reference, genetic_code):
+    """Validates the reference arguments of :func:`CAI` and returns the weights."""
 
-    # calculate the weights
-    weights = {}
-    for codon in RSCUs:
-        weights[codon] = RSCUs[codon] / max(
-            (RSCUs[_codon] for _codon in synonymous_codons[codon])
+    # validate user input
+    if sum([bool(reference), bool(RSCUs)], bool(weights)) != 1:
+        raise TypeError(
+            "Must provide either reference sequences, or RSCU dictionary, or weights"
         )
 
+    # generate weights if not given
+    if reference:
+        weights = relative_adaptiveness(sequences=reference, genetic_code=genetic_code)
+    elif RSCUs:
+        weights = relative_adaptiveness(RSCUs=RSCUs, genetic_code=genetic_code)
+
     return weights
 
 
-def CAI(sequence, weights=None, RSCUs=None, reference=None, genetic_code=11):
+def _scoring_masks(weights, genetic_code):
+    """Determines how each codon contributes to the CAI for a weights array.
+
+    Codons without synonyms are not counted -> "Also, the number of AUG and UGG
+    codons are subtracted from L, since the RSCU values for AUG and UGG are
+    both fixed at 1.0, and so do not contribute to the CAI." (page 1285). Stop
+    codons without a weight are ignored but any other codon without one is an
+    error.
+
+    Returns:
+        tuple: Whether each codon is counted, the log weight of each codon (zero
+        if it isn't counted) and whether each codon is missing a weight.
+    """
+    table = _codon_tables[genetic_code]
+    has_weight = ~np.isnan(weights)
+    counted = ~table["non_synonymous"] & has_weight
+    missing = ~table["non_synonymous"] & ~has_weight & ~table["stop"]
+    with np.errstate(divide="ignore"):
+        log_weights = np.where(counted, np.log(np.where(counted, weights, 1)), 0.0)
+    return counted, log_weights, missing
+
+
+def _missing_weight_error(codon):
+    return KeyError(
+        "Bad weights dictionary passed: missing weight for codon " + codon + "."
+    )
+
+
+def _unscorable_codon_error(sequence, codons, missing, index=None, id=None):
+    """Builds the error for the first codon of an encoded sequence that can't be scored.
+
+    Args:
+        sequence: The sequence, as it was given.
+        codons (numpy.ndarray): The encoded sequence.
+        missing (numpy.ndarray): Whether each codon of the sequence is missing a
+            weight.
+        index (int, optional): The position of the sequence among those given.
+        id (str, optional): The ID of the sequence.
+    """
+    i = int(np.argmax(missing))
+    if codons[i] == _INVALID:
+        message = _ambiguous_codon_message(_codon_at(sequence, i))
+    else:
+        message = _missing_weight_error(_codon_at(sequence, i)).args[0]
+    return KeyError(_located(message, index, id))
+
+
+def _weights_array(weights):
+    """Lines up a weights dictionary by codon index, using nan for missing codons."""
+    array = np.full(_INVALID + 1, np.nan)
+    for codon, weight in weights.items():
+        if isinstance(codon, str):
+            i = _CODON_INDEX.get(codon.upper().replace("U", "T"))
+        else:
+            i = _codon_index(codon)
+        if i is not None:
+            array[i] = weight
+    return array
+
+
+def CAI(
+    sequence,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    ambiguous="error",
+):
     r"""Calculates the codon adaptation index (CAI) of a DNA sequence.
 
 
@@ -180,12 +722,19 @@ def CAI(sequence, weights=None, RSCUs=None, reference=None, genetic_code=11):
 
     Args:
         sequence (str): The DNA sequence to calculate the CAI for.
-        weights (dict, optional): The relative adaptiveness of the codons in the reference set.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
         RSCUs (dict, optional): The RSCU of the reference set.
         reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        ambiguous (str, optional): What to do with codons containing something
+            other than A, C, G, T or U, such as N: ``"error"`` raises a KeyError,
+            ``"skip"`` drops them from the sequence and ``"count-as-invalid"``
+            keeps their place in the sequence without scoring them. Defaults to
+            ``"error"``.
 
     Note:
-        One of ``weights``, ``reference`` or ``RSCUs`` is required.
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. Either way,
+        ambiguous codons never count towards the CAI.
 
     Returns:
         float: The CAI of the sequence.
@@ -199,47 +748,482 @@ def CAI(sequence, weights=None, RSCUs=None, reference=None, genetic_code=11):
         Will return nan if the sequence only has codons without synonyms.
     """
 
-    # validate user input
-    if sum([bool(reference), bool(RSCUs)], bool(weights)) != 1:
-        raise TypeError(
-            "Must provide either reference sequences, or RSCU dictionary, or weights"
+    return Weights(weights, RSCUs, reference, genetic_code).score(
+        sequence, ambiguous=ambiguous
+    )
+
+
+def CAI_batch(
+    sequences,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    n_jobs=1,
+    ambiguous="error",
+    return_masked=False,
+):
+    r"""Calculates the codon adaptation index (CAI) of many DNA sequences at once.
+
+    This gives the same results as calling :func:`CAI` on each sequence but
+    validates the arguments and derives the weights only once, then scores all
+    of the sequences together.
+
+    Args:
+        sequences (iterable): The DNA sequences to calculate the CAI for.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        n_jobs (int, optional): The number of processes to score with. -1 uses one per CPU. Defaults to 1.
+        ambiguous (str, optional): What to do with codons containing something
+            other than A, C, G, T or U, such as N: ``"error"`` raises a KeyError,
+            ``"skip"`` drops them from the sequence and ``"count-as-invalid"``
+            keeps their place in the sequence without scoring them. Defaults to
+            ``"error"``.
+        return_masked (bool, optional): Whether to also return the number of
+            ambiguous codons in each sequence. Defaults to False.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required.
+
+    Returns:
+        numpy.ndarray: The CAI of each sequence, in the order they were given.
+        With ``return_masked``, a tuple of that and an array of the number of
+        ambiguous codons masked in each sequence.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When a sequence is empty or not divisible by three.
+        KeyError: When there is a missing weight for a codon.
+
+    Warning:
+        The CAI of sequences that only have codons without synonyms will be nan.
+    """
+
+    return Weights(weights, RSCUs, reference, genetic_code).score_many(
+        sequences, n_jobs=n_jobs, ambiguous=ambiguous, return_masked=return_masked
+    )
+
+
+def CAI_profile(
+    sequence,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    window=30,
+    step=1,
+    ambiguous="error",
+):
+    r"""Calculates the codon adaptation index (CAI) in windows along a DNA sequence.
+
+    Each value is the CAI of ``window`` consecutive codons, as :func:`CAI` would
+    calculate it for that part of the sequence. This is useful for finding
+    stretches of a gene made of rare codons.
+
+    Args:
+        sequence (str): The DNA sequence to calculate the CAI profile for.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        window (int, optional): The number of codons in each window. Defaults to 30.
+        step (int, optional): The number of codons between window starts. Defaults to 1.
+        ambiguous (str, optional): How to handle ambiguous codons. Skipped codons
+            are left out of the windows altogether, while those counted as invalid
+            take up a place in a window without being scored. See :func:`CAI`.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required.
+
+    Returns:
+        numpy.ndarray: The CAI of each window, which is nan for windows that only
+        have codons without synonyms. It is empty if the sequence is shorter than
+        one window.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When the sequence is invalid or the window or step isn't positive.
+        KeyError: When there is a missing weight for a codon.
+    """
+    return Weights(weights, RSCUs, reference, genetic_code).profile(
+        sequence, window=window, step=step, ambiguous=ambiguous
+    )
+
+
+def _segment_scores(weights, codons, starts, ends):
+    """Calculates the CAI of many segments of an encoded sequence at once.
+
+    The CAI of every segment is worked out from running totals of the log
+    weights, so long or overlapping segments cost no extra time.
+
+    Args:
+        weights (Weights): The weights to score the segments with.
+        codons (numpy.ndarray): The encoded sequence, with a weight for every
+            codon that is counted.
+        starts (numpy.ndarray): The index of the first codon of each segment.
+        ends (numpy.ndarray): The index of the codon after each segment.
+
+    Returns:
+        numpy.ndarray: The CAI of each segment.
+    """
+
+    def running_total(values):
+        return np.concatenate(([0], np.cumsum(values)))
+
+    # codons with a weight of zero are tallied on their own since their log
+    # weight of -inf would spoil every running total after them
+    log_weights = weights._log_weights[codons]
+    zeros = np.isneginf(log_weights)
+    log_weights[zeros] = 0
+    totals = running_total(log_weights)
+    lengths = running_total(weights._counted[codons])
+    zeros = running_total(zeros)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.exp(
+            (totals[ends] - totals[starts]) / (lengths[ends] - lengths[starts])
         )
+    scores[zeros[ends] > zeros[starts]] = 0
+    return scores
 
-    # validate sequence
-    if not sequence:
-        raise ValueError("Sequence cannot be empty")
 
-    # make sure input sequence can be divided into codons. If so, split into list of codons
-    if len(sequence) % 3 != 0:
-        raise ValueError("Input sequence not divisible by three")
-    sequence = sequence.upper()
-    sequence = [sequence[i : i + 3] for i in range(0, len(sequence), 3)]
+class Weights:
+    r"""Codon weights prepared for repeatedly calculating the CAI.
 
-    # generate weights if not given
-    if reference:
-        weights = relative_adaptiveness(sequences=reference, genetic_code=genetic_code)
-    elif RSCUs:
-        weights = relative_adaptiveness(RSCUs=RSCUs, genetic_code=genetic_code)
+    Calling :func:`CAI` works out the weights of the reference set and how each
+    codon should be treated every time. A :class:`Weights` object does this once
+    when it is created so that scoring sequences with :meth:`score` and
+    :meth:`score_many` only has to look up the codons of the sequences.
+
+    :class:`Weights` objects can't be modified once created, so they are safe to
+    share between threads, and can be pickled to send them to other processes.
+
+    Args:
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`Weights` object brings its own genetic code.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: See :func:`RSCU` for details.
+    """
+
+    __slots__ = ("genetic_code", "_weights", "_log_weights", "_counted", "_missing")
+
+    def __init__(self, weights=None, RSCUs=None, reference=None, genetic_code=11):
+        # another Weights object is shared rather than worked out again, since
+        # neither can be modified
+        if isinstance(weights, Weights):
+            if RSCUs or reference:
+                raise TypeError(
+                    "Must provide either reference sequences, or RSCU dictionary, "
+                    "or weights"
+                )
+            genetic_code = weights.genetic_code
+            counted, log_weights, missing = (
+                weights._counted,
+                weights._log_weights,
+                weights._missing,
+            )
+            weights = weights._weights
+        else:
+            weights = _weights_array(
+                _resolve_weights(weights, RSCUs, reference, genetic_code)
+            )
+            counted, log_weights, missing = _scoring_masks(weights, genetic_code)
+            for array in (weights, log_weights, counted, missing):
+                array.setflags(write=False)
+
+        object.__setattr__(self, "genetic_code", genetic_code)
+        object.__setattr__(self, "_weights", weights)
+        object.__setattr__(self, "_log_weights", log_weights)
+        object.__setattr__(self, "_counted", counted)
+        object.__setattr__(self, "_missing", missing)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Weights objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Weights objects are immutable")
+
+    def __reduce__(self):
+        return (self.__class__, (self.to_dict(), None, None, self.genetic_code))
+
+    def __repr__(self):
+        return "Weights(genetic_code={})".format(self.genetic_code)
+
+    def save(self, path, **provenance):
+        """Saves the weights to a JSON file that can be read back with :meth:`load`.
+
+        The file records the weights, the genetic code and a version number for
+        the file layout.
+
+        Args:
+            path (str): Where to write the file.
+            **provenance: Any JSON-serializable details about where the weights
+                came from, such as the reference file they were calculated from.
+        """
+        index = {
+            "format": _INDEX_FORMAT,
+            "version": _INDEX_VERSION,
+            "genetic_code": self.genetic_code,
+            "weights": self.to_dict(),
+            "provenance": provenance,
+        }
+        with open(path, "w") as f:
+            json.dump(index, f, indent=2)
 
-    # create a list of the weights for the sequence, not counting codons without
-    # synonyms -> "Also, the number of AUG and UGG codons are
-    # subtracted from L, since the RSCU values for AUG and UGG are both fixed at
-    # 1.0, and so do not contribute to the CAI." (page 1285)
-    sequence_weights = []
-    for codon in sequence:
-        if codon not in _non_synonymous_codons[genetic_code]:
+    @classmethod
+    def load(cls, path):
+        """Reads weights saved with :meth:`save`.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            Weights: The saved weights, for the saved genetic code.
+
+        Raises:
+            ValueError: When the file wasn't written by :meth:`save` or by a newer
+                version of CAI.
+        """
+        with open(path) as f:
             try:
-                sequence_weights.append(weights[codon])
-            except KeyError:
-                # ignore stop codons
-                if codon in ct.unambiguous_dna_by_id[genetic_code].stop_codons:
-                    pass
-                else:
-                    raise KeyError(
-                        "Bad weights dictionary passed: missing weight for codon "
-                        + str(codon)
-                        + "."
-                    )
-
-    # return the geometric mean of the weights raised to one over the length of the sequence
-    return float(gmean(sequence_weights))
+                index = json.load(f)
+            except ValueError:
+                index = None
+        if not isinstance(index, dict) or index.get("format") != _INDEX_FORMAT:
+            raise ValueError(str(path) + " is not a CAI weights file")
+        version = index.get("version")
+        if isinstance(version, int) and version > _INDEX_VERSION:
+            raise ValueError(
+                str(path) + " was written by a newer version of CAI and can't be read"
+            )
+        weights = index.get("weights")
+        genetic_code = index.get("genetic_code")
+        if (
+            not isinstance(version, int)
+            or not isinstance(weights, dict)
+            or not isinstance(genetic_code, int)
+        ):
+            raise ValueError(str(path) + " is not a CAI weights file")
+        return cls(weights, genetic_code=genetic_code)
+
+    def to_dict(self):
+        """Returns the weights as a dictionary like :func:`relative_adaptiveness`."""
+        return {
+            codon: float(self._weights[i])
+            for i, codon in enumerate(_CODONS)
+            if not np.isnan(self._weights[i])
+        }
+
+    def _missing_for(self, ambiguous):
+        """Marks the codons without a weight, given how ambiguous ones are handled."""
+        if ambiguous == "error":
+            return self._missing
+        _check_ambiguous(ambiguous)
+        missing = self._missing.copy()
+        missing[_INVALID] = False
+        return missing
+
+    def _encode(self, sequence, ambiguous="error", index=None):
+        """Validates and encodes a sequence, making sure every codon has a weight.
+
+        Ambiguous codons are handled according to ``ambiguous`` (see :func:`CAI`),
+        so the result only has ``_INVALID`` codons in it when they are counted as
+        invalid. ``index`` is the position of the sequence to give in errors.
+        """
+
+        # validate sequence
+        if not len(sequence):
+            raise ValueError("Sequence cannot be empty")
+        if len(sequence) % 3 != 0:
+            raise ValueError("Input sequence not divisible by three")
+        codons = _encode(sequence)
+
+        missing = self._missing_for(ambiguous)[codons]
+        if missing.any():
+            raise _unscorable_codon_error(sequence, codons, missing, index)
+        if ambiguous == "skip":
+            codons = codons[codons != _INVALID]
+        return codons
+
+    def score(self, sequence, ambiguous="error"):
+        """Calculates the CAI of a DNA sequence.
+
+        Args:
+            sequence (str): The DNA sequence to calculate the CAI for.
+            ambiguous (str, optional): How to handle ambiguous codons. See :func:`CAI`.
+
+        Returns:
+            float: The CAI of the sequence. See :func:`CAI` for details.
+
+        Raises:
+            ValueError: When the sequence is empty or not divisible by three.
+            KeyError: When there is a missing weight for a codon.
+        """
+        # a single sequence is timed as one stage, since splitting it up would
+        # cost about as much as validating and encoding it
+        with profiler.stage("scoring", sequences=1, codons=len(sequence) // 3):
+            codons = self._encode(sequence, ambiguous)
+
+            # the CAI is the exponential of the mean log weight of the counted
+            # codons
+            log_weights = self._log_weights[codons[self._counted[codons]]]
+            if not len(log_weights):
+                return float("nan")
+            return float(np.exp(np.mean(log_weights)))
+
+    def score_many(
+        self, sequences, n_jobs=1, ambiguous="error", return_masked=False, ids=None
+    ):
+        """Calculates the CAI of many DNA sequences at once.
+
+        Ambiguous codons are masked out of all of the sequences at once by
+        looking them up with the rest of the codons, so real assemblies full of
+        Ns cost no more to score than clean sequences.
+
+        Args:
+            sequences (iterable): The DNA sequences to calculate the CAI for.
+            n_jobs (int, optional): The number of processes to score with. -1 uses one per CPU. Defaults to 1.
+            ambiguous (str, optional): How to handle ambiguous codons. See :func:`CAI`.
+            return_masked (bool, optional): Whether to also return the number of
+                ambiguous codons in each sequence. Defaults to False.
+            ids (iterable, optional): The ID of each sequence, to say which one is
+                at fault in errors.
+
+        Returns:
+            numpy.ndarray: The CAI of each sequence, in the order they were given.
+            With ``return_masked``, a tuple of that and an array of the number of
+            ambiguous codons masked in each sequence.
+
+        Raises:
+            ValueError: When ``ids`` doesn't have one ID for each sequence.
+            InvalidSequenceError: When a sequence is empty or not divisible by
+                three, giving its position and ID.
+            KeyError: When there is a missing weight for a codon, also giving the
+                position and ID of the sequence.
+        """
+        self._missing_for(ambiguous)
+        if ids is None:
+            ids = repeat(None)
+        else:
+            ids, sequences = list(ids), list(sequences)
+            if len(ids) != len(sequences):
+                raise ValueError("There must be one ID for each sequence")
+
+        # every sequence carries its position (and ID) with it, so that errors
+        # from worker processes say which sequence it was overall
+        records = zip(count(), ids, sequences)
+        score = partial(
+            self._score_records, ambiguous=ambiguous, return_masked=return_masked
+        )
+        if n_jobs == 1:
+            return score(records)
+
+        # score chunks of sequences in worker processes and put them back together
+        from ._parallel import map_chunks
+
+        # the worker processes are timed as a whole
+        with profiler.stage("scoring") as stage:
+            results = list(map_chunks(score, records, n_jobs))
+            if not return_masked:
+                results = [(scores, None) for scores in results]
+            stage.count(sequences=sum(len(scores) for scores, _ in results))
+        scores = np.concatenate([np.empty(0)] + [scores for scores, _ in results])
+        if not return_masked:
+            return scores
+        masked = np.concatenate(
+            [np.empty(0, dtype=np.intp)] + [masked for _, masked in results]
+        )
+        return scores, masked
+
+    def _score_records(self, records, ambiguous="error", return_masked=False):
+        """Scores ``(index, ID, sequence)`` records. See :meth:`score_many`."""
+        missing = self._missing_for(ambiguous)
+
+        buffers = []
+        locations = []
+        with profiler.stage("validation") as stage:
+            for index, id, sequence in records:
+                buffer = _as_bytes(sequence)
+                problem = _length_problem(len(buffer))
+                if problem is not None:
+                    raise InvalidSequenceError(problem, index, id)
+                buffers.append(buffer)
+                locations.append((index, id))
+            stage.count(sequences=len(buffers))
+        if not buffers:
+            return (
+                (np.empty(0), np.empty(0, dtype=np.intp))
+                if return_masked
+                else np.empty(0)
+            )
+
+        # since every sequence is a whole number of codons, the sequences can be
+        # encoded together and split up afterwards
+        with profiler.stage("encoding", sequences=len(buffers)) as stage:
+            sequences = np.concatenate(buffers)
+            codons = _encode(sequences)
+            starts = np.cumsum([0] + [len(buffer) // 3 for buffer in buffers[:-1]])
+            stage.count(codons=len(codons))
+
+            # ambiguous codons that aren't an error are left in place, since they
+            # are never counted anyway
+            unscorable = missing[codons]
+            if unscorable.any():
+                row = int(np.searchsorted(starts, np.argmax(unscorable), "right")) - 1
+                start, end = starts[row], starts[row] + len(buffers[row]) // 3
+                raise _unscorable_codon_error(
+                    buffers[row],
+                    codons[start:end],
+                    unscorable[start:end],
+                    *locations[row]
+                )
+
+        # the CAI is the exponential of the mean log weight of the counted codons
+        with profiler.stage("scoring", sequences=len(buffers), codons=len(codons)):
+            totals = np.add.reduceat(self._log_weights[codons], starts)
+            lengths = np.add.reduceat(self._counted[codons].astype(np.intp), starts)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.exp(totals / lengths)
+            if not return_masked:
+                return scores
+            masked = np.add.reduceat((codons == _INVALID).astype(np.intp), starts)
+            return scores, masked
+
+    def profile(self, sequence, window=30, step=1, ambiguous="error"):
+        """Calculates the CAI of each window along a DNA sequence.
+
+        Windows are ``window`` codons long and start every ``step`` codons from
+        the start of the sequence. Codons are counted the same way as in
+        :func:`CAI`. All windows are calculated at once from running totals of
+        the log weights, so longer windows cost no extra time.
+
+        Args:
+            sequence (str): The DNA sequence to calculate the CAI profile for.
+            window (int, optional): The number of codons in each window. Defaults to 30.
+            step (int, optional): The number of codons between window starts. Defaults to 1.
+            ambiguous (str, optional): How to handle ambiguous codons. See :func:`CAI_profile`.
+
+        Returns:
+            numpy.ndarray: The CAI of each window. It is empty if the sequence is
+            shorter than one window.
+
+        Raises:
+            ValueError: When the sequence is empty or not divisible by three or
+                the window or step isn't positive.
+            KeyError: When there is a missing weight for a codon.
+        """
+        if window < 1 or step < 1:
+            raise ValueError("The window and step must be positive")
+        with profiler.stage("scoring", sequences=1, codons=len(sequence) // 3):
+            codons = self._encode(sequence, ambiguous)
+            starts = np.arange(0, len(codons) - window + 1, step)
+            return _segment_scores(self, codons, starts, starts + window)
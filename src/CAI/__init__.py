@@ -4,4 +4,24 @@
 
 from CAI._version import version as __version__
 
-from .CAI import RSCU, relative_adaptiveness, CAI
+from .CAI import (
+    RSCU,
+    RSCUAccumulator,
+    relative_adaptiveness,
+    CAI,
+    CAI_batch,
+    CAI_profile,
+    Weights,
+    InvalidSequenceError,
+    reference_cache,
+)
+from .cache import ReferenceCache
+from .contributions import CAIContributions, CAI_contributions
+from .counts import CodonCountMatrix, ReferenceRefinement, RefinementStep
+from .expected import ExpectedCAI, expected_CAI, expected_CAI_batch
+from .fasta import read_fasta
+from .indices import CodonIndices, codon_indices
+from .instrumentation import Profiler, profiler, profiling
+from .optimize import optimize, optimize_many
+from .orfs import ORF, scan_orfs
+from .variants import IncrementalCAI
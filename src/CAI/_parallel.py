@@ -0,0 +1,54 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os
+
+# the number of sequences handed to a worker process at once
+CHUNKSIZE = 500
+
+
+def _n_workers(n_jobs):
+    """Turns an ``n_jobs`` argument into a number of processes.
+
+    Negative numbers count back from the number of CPUs, so -1 uses all of them.
+    """
+    if n_jobs == 0:
+        raise ValueError("n_jobs cannot be zero")
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return n_jobs
+
+
+def chunks(iterable, size):
+    """Splits an iterable into lists of ``size`` items (the last may be shorter)."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def map_chunks(function, iterable, n_jobs, chunksize=CHUNKSIZE):
+    """Applies a function to chunks of an iterable in worker processes.
+
+    Only a few chunks per worker are read ahead of the results being consumed,
+    so the iterable can be a stream of any length.
+
+    Args:
+        function (callable): A picklable function taking a list of items.
+        iterable (iterable): The items to split into chunks.
+        n_jobs (int): The number of worker processes. -1 uses one per CPU.
+        chunksize (int, optional): The number of items in each chunk.
+
+    Yields:
+        The result of ``function`` for each chunk, in the order of the chunks.
+    """
+    n_workers = _n_workers(n_jobs)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for chunk in chunks(iterable, chunksize):
+            pending.append(executor.submit(function, chunk))
+            if len(pending) >= 2 * n_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
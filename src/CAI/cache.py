@@ -0,0 +1,84 @@
+from collections import OrderedDict, namedtuple
+import threading
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class ReferenceCache:
+    """A least recently used cache for results calculated from reference sets.
+
+    The cache starts out disabled and has to be turned on with :meth:`enable`.
+    While it is disabled, nothing is stored and lookups always miss without
+    being counted.
+
+    Args:
+        maxsize (int, optional): The number of results to keep. Defaults to 0, which disables the cache.
+    """
+
+    def __init__(self, maxsize=0):
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._hits = self._misses = 0
+        self._maxsize = maxsize
+
+    @property
+    def enabled(self):
+        return self._maxsize > 0
+
+    def enable(self, maxsize=128):
+        """Turns the cache on, evicting the oldest results if there are too many.
+
+        Args:
+            maxsize (int, optional): The number of results to keep. Defaults to 128.
+
+        Raises:
+            ValueError: When ``maxsize`` isn't positive.
+        """
+        if maxsize <= 0:
+            raise ValueError("The cache size must be positive")
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._results) > maxsize:
+                self._results.popitem(last=False)
+
+    def disable(self):
+        """Turns the cache off and removes all of its results."""
+        with self._lock:
+            self._maxsize = 0
+            self._results.clear()
+
+    def clear(self):
+        """Removes all results and resets the hit and miss counts."""
+        with self._lock:
+            self._results.clear()
+            self._hits = self._misses = 0
+
+    def info(self):
+        """Returns the hit and miss counts and the maximum and current size."""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._maxsize, len(self._results)
+            )
+
+    def get(self, key):
+        """Returns the result stored for ``key`` or None if there isn't one."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            try:
+                self._results.move_to_end(key)
+            except KeyError:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return self._results[key]
+
+    def put(self, key, result):
+        """Stores a result, evicting the least recently used one if full."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self._maxsize:
+                self._results.popitem(last=False)
@@ -1,22 +1,406 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import partial
+from itertools import chain
+import os
+import warnings
 import click
-from Bio import SeqIO
-from Bio.Seq import Seq
-from .CAI import CAI
+from . import __version__
+import numpy as np
+from .CAI import (
+    RSCU,
+    InvalidSequenceError,
+    Weights,
+    _AMBIGUOUS_POLICIES,
+    _INVALID,
+    _as_bytes,
+    _digest,
+    _encode,
+)
+from .fasta import read_fasta
+from .instrumentation import profiling
+from .orfs import scan_orfs
+from ._parallel import CHUNKSIZE, chunks, map_chunks
 
 
-@click.command()
-@click.option(
-    "-s",
-    "--sequence",
+def _score_records(weights, ambiguous, records):
+    """Scores a chunk of (index, ID, sequence) records and returns a table row for each.
+
+    The records keep their position in the file, so errors say which one it was
+    whichever chunk it is in.
+    """
+    scores = weights._score_records(records, ambiguous=ambiguous)
+    return [
+        (name, len(sequence), len(sequence) // 3, score)
+        for (_, name, sequence), score in zip(records, scores)
+    ]
+
+
+def _message(error):
+    """Gets the message of an error, without the quotes a KeyError puts around it."""
+    if isinstance(error, KeyError) and len(error.args) == 1:
+        return str(error.args[0])
+    return str(error)
+
+
+def _reference_weights(reference, genetic_code, jobs, invalid="error"):
+    """Calculates the weights of the reference sequences in a FASTA file."""
+    ids, sequences = [], []
+    for name, sequence in read_fasta(reference):
+        ids.append(name)
+        sequences.append(sequence)
+    try:
+        # the tally of skipped sequences is reported without a warning's traceback
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            RSCUs = RSCU(
+                sequences,
+                genetic_code=genetic_code,
+                n_jobs=jobs,
+                ids=ids,
+                invalid=invalid,
+            )
+    except InvalidSequenceError as e:
+        raise click.ClickException("{}: {}".format(reference, e))
+    for warning in caught:
+        click.echo("{}: {}".format(reference, warning.message), err=True)
+    return Weights(RSCUs=RSCUs, genetic_code=genetic_code), sequences
+
+
+def _load_index(index, genetic_code):
+    try:
+        weights = Weights.load(index)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if genetic_code is not None and genetic_code != weights.genetic_code:
+        raise click.UsageError(
+            "The index was built for genetic code {}, not {}".format(
+                weights.genetic_code, genetic_code
+            )
+        )
+    return weights
+
+
+def _weights(sequence, reference, index, genetic_code, jobs):
+    """Checks the scoring options and loads or calculates the weights."""
+    if sequence is None:
+        raise click.UsageError("Missing option '-s' / '--sequence'.")
+    if (reference is None) == (index is None):
+        raise click.UsageError(
+            "Provide either '-r' / '--reference' or '-i' / '--index'."
+        )
+
+    if index is not None:
+        return _load_index(index, genetic_code)
+    weights, _ = _reference_weights(
+        reference, 11 if genetic_code is None else genetic_code, jobs
+    )
+    return weights
+
+
+def _score(sequence, reference, index, genetic_code, jobs, output, ambiguous, table):
+    """Scores the records of a FASTA file, writing a table of their CAIs.
+
+    Without ``table``, a file with a single record just gets its CAI printed.
+    """
+    # the weights are only calculated once, no matter how many sequences there are
+    weights = _weights(sequence, reference, index, genetic_code, jobs)
+
+    records = read_fasta(sequence)
+    first = next(records, None)
+    second = next(records, None)
+    if first is None:
+        raise click.ClickException("No sequences found in " + sequence)
+
+    head = [first] if second is None else [first, second]
+    records = (
+        (position, name, record)
+        for position, (name, record) in enumerate(chain(head, records))
+    )
+    score = partial(_score_records, weights, ambiguous)
+    try:
+        if second is None and not table:
+            (row,) = score(list(records))
+            click.echo(row[3], file=output)
+            return
+
+        # stream the records through in chunks and write a row for each
+        if jobs == 1:
+            rows = map(score, chunks(records, CHUNKSIZE))
+        else:
+            rows = map_chunks(score, records, jobs)
+
+        click.echo("id\tlength\tcodons\tCAI", file=output)
+        for row in chain.from_iterable(rows):
+            click.echo("{}\t{}\t{}\t{}".format(*row), file=output)
+    except (ValueError, KeyError) as e:
+        raise click.ClickException("{}: {}".format(sequence, _message(e)))
+
+
+@contextmanager
+def _profiled(enabled):
+    """Profiles the block if asked to, printing the stage totals to stderr."""
+    if not enabled:
+        yield
+        return
+    with profiling() as profiler:
+        yield
+    click.echo(profiler.report(), err=True)
+
+
+_reference_option = click.option(
+    "-r",
+    "--reference",
     type=click.Path(exists=True, dir_okay=False),
-    help="The sequence to calculate the CAI for.",
-    required=True,
+    help="The reference sequences to calculate CAI against.",
+)
+_jobs_option = click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    help="The number of processes to use. -1 uses one per CPU. Defaults to 1.",
+)
+_profile_option = click.option(
+    "--profile",
+    "show_profile",
+    is_flag=True,
+    help="Print the time spent in each stage and the sequences and codons it "
+    "processed to stderr.",
+)
+
+
+def _scoring_options(function):
+    options = [
+        click.option(
+            "-s",
+            "--sequence",
+            type=click.Path(exists=True, dir_okay=False),
+            help="The sequence(s) to calculate the CAI for.",
+        ),
+        _reference_option,
+        click.option(
+            "-i",
+            "--index",
+            type=click.Path(exists=True, dir_okay=False),
+            help="A weights file made by 'CAI build-index' to use instead of a "
+            "reference.",
+        ),
+        click.option(
+            "-g",
+            "--genetic-code",
+            type=int,
+            help="The genetic code to use. Defaults to 11, or the genetic code of "
+            "the index.",
+        ),
+        _jobs_option,
+        click.option(
+            "-o",
+            "--output",
+            type=click.File("w"),
+            help="Where to write the results. Defaults to stdout.",
+        ),
+        click.option(
+            "--ambiguous",
+            type=click.Choice(_AMBIGUOUS_POLICIES),
+            default="error",
+            help="What to do with codons containing something other than A, C, G, "
+            "T or U: stop with an 'error', 'skip' them or 'count-as-invalid' "
+            "without scoring them. Defaults to 'error'.",
+        ),
+        _profile_option,
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+@click.group(invoke_without_command=True)
+@_scoring_options
+@click.pass_context
+def cli(
+    ctx, sequence, reference, index, genetic_code, jobs, output, ambiguous, show_profile
+):
+    """Calculates the codon adaptation index (CAI) of DNA sequences.
+
+    Without a command, this does the same as 'CAI score', except that the CAI of
+    a single sequence is printed on its own unless '-o' / '--output' is given.
+    """
+    if ctx.invoked_subcommand is None:
+        with _profiled(show_profile):
+            _score(
+                sequence,
+                reference,
+                index,
+                genetic_code,
+                jobs,
+                output,
+                ambiguous,
+                output is not None,
+            )
+
+
+@cli.command()
+@_scoring_options
+def score(
+    sequence, reference, index, genetic_code, jobs, output, ambiguous, show_profile
+):
+    """Calculates the CAI of sequences against a reference or index.
+
+    Writes a table with the ID, length, number of codons and CAI of each
+    sequence.
+    """
+    with _profiled(show_profile):
+        _score(
+            sequence,
+            reference,
+            index,
+            genetic_code,
+            jobs,
+            output,
+            ambiguous,
+            True,
+        )
+
+
+def _window_bounds(sequence, window, step, count, ambiguous):
+    """Finds the first and last nucleotide (counting from one) of profile windows.
+
+    Skipped ambiguous codons aren't part of any window, so the windows are
+    found among the positions of the codons that are kept.
+    """
+    if ambiguous == "skip":
+        kept = np.flatnonzero(_encode(_as_bytes(sequence)) != _INVALID)
+    else:
+        kept = np.arange(len(sequence) // 3)
+    first = np.arange(count) * step
+    return (3 * kept[first] + 1).tolist(), (3 * kept[first + window - 1] + 3).tolist()
+
+
+@cli.command()
+@_scoring_options
+@click.option(
+    "-w",
+    "--window",
+    type=int,
+    default=30,
+    help="The number of codons in each window. Defaults to 30.",
+)
+@click.option(
+    "--step",
+    type=int,
+    default=1,
+    help="The number of codons between window starts. Defaults to 1.",
+)
+def profile(
+    sequence,
+    reference,
+    index,
+    genetic_code,
+    jobs,
+    output,
+    ambiguous,
+    show_profile,
+    window,
+    step,
+):
+    """Calculates the CAI in sliding windows along each sequence.
+
+    Writes a table with the ID of the sequence, the first and last nucleotide
+    of the window (counting from one) and its CAI. Skipped ambiguous codons
+    don't count towards the length of a window, so it spans them.
+    """
+    if window < 1 or step < 1:
+        raise click.UsageError("The window and step must be positive.")
+    with _profiled(show_profile):
+        weights = _weights(sequence, reference, index, genetic_code, jobs)
+
+        click.echo("id\tstart\tend\tCAI", file=output)
+        for name, record in read_fasta(sequence):
+            try:
+                values = weights.profile(
+                    record, window=window, step=step, ambiguous=ambiguous
+                )
+            except (ValueError, KeyError) as e:
+                raise click.ClickException("{}: {}".format(name, _message(e)))
+            starts, ends = _window_bounds(record, window, step, len(values), ambiguous)
+            for start, end, value in zip(starts, ends, values):
+                click.echo(
+                    "{}\t{}\t{}\t{}".format(name, start, end, value), file=output
+                )
+
+
+def _scan_records(weights, min_codons, ambiguous, records):
+    """Finds and scores the ORFs of a chunk of (ID, sequence) pairs."""
+    return list(scan_orfs(records, weights, min_codons=min_codons, ambiguous=ambiguous))
+
+
+@cli.command()
+@_scoring_options
+@click.option(
+    "--min-codons",
+    type=int,
+    default=100,
+    help="The fewest codons an ORF can have, not counting the stop codon. "
+    "Defaults to 100.",
 )
+def scan(
+    sequence,
+    reference,
+    index,
+    genetic_code,
+    jobs,
+    output,
+    ambiguous,
+    show_profile,
+    min_codons,
+):
+    """Finds the ORFs in all six frames of contigs and calculates their CAI.
+
+    Writes a table with the ID of the contig, the strand and frame of each ORF,
+    its first and last nucleotide on the forward strand (counting from one,
+    with the stop codon), its number of codons and its CAI.
+    """
+    if min_codons < 0:
+        raise click.UsageError("The minimum number of codons can't be negative.")
+    with _profiled(show_profile):
+        weights = _weights(sequence, reference, index, genetic_code, jobs)
+
+        # contigs are large, so each worker process is handed one at a time
+        records = read_fasta(sequence)
+        if jobs == 1:
+            orfs = scan_orfs(
+                records, weights, min_codons=min_codons, ambiguous=ambiguous
+            )
+        else:
+            scan = partial(_scan_records, weights, min_codons, ambiguous)
+            orfs = chain.from_iterable(map_chunks(scan, records, jobs, chunksize=1))
+
+        click.echo("id\tstrand\tframe\tstart\tend\tcodons\tCAI", file=output)
+        try:
+            for orf in orfs:
+                click.echo(
+                    "{}\t{}\t{}\t{}\t{}\t{}\t{}".format(
+                        orf.contig,
+                        orf.strand,
+                        orf.frame,
+                        orf.start + 1,
+                        orf.end,
+                        orf.codons,
+                        orf.CAI,
+                    ),
+                    file=output,
+                )
+        except KeyError as e:
+            raise click.ClickException(_message(e))
+
+
+@cli.command("build-index")
 @click.option(
     "-r",
     "--reference",
     type=click.Path(exists=True, dir_okay=False),
-    help="The reference sequences to calculate CAI against.",
+    help="The reference sequences to calculate the weights of.",
     required=True,
 )
 @click.option(
@@ -26,10 +410,140 @@ from .CAI import CAI
     default=11,
     help="The genetic code to use. Defaults to 11.",
 )
-def cli(reference, sequence, genetic_code):
-    sequence = SeqIO.read(sequence, "fasta").seq
-    reference = [str(x.seq) for x in SeqIO.parse(reference, "fasta")]
-    print(CAI(sequence, reference=reference, genetic_code=genetic_code))
+@_jobs_option
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Where to write the weights file.",
+    required=True,
+)
+@click.option(
+    "--skip-invalid",
+    is_flag=True,
+    help="Leave out reference sequences that are empty or not divisible by three "
+    "instead of stopping, and say how many were left out.",
+)
+@_profile_option
+def build_index(reference, genetic_code, jobs, output, skip_invalid, show_profile):
+    """Saves the weights of a reference set for use with 'CAI score --index'."""
+    with _profiled(show_profile):
+        weights, sequences = _reference_weights(
+            reference, genetic_code, jobs, "skip" if skip_invalid else "error"
+        )
+    weights.save(
+        output,
+        reference=os.path.basename(reference),
+        sequences=len(sequences),
+        digest=_digest(sequences).hex(),
+        created=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        CAI_version=__version__,
+    )
+
+
+def _named_paths(pairs, option):
+    """Splits NAME=PATH option values into a dictionary."""
+    paths = {}
+    for pair in pairs:
+        name, separator, path = pair.partition("=")
+        if not separator or not name:
+            raise click.BadParameter(
+                "Expected NAME=PATH, not " + pair, param_hint=option
+            )
+        if not os.path.isfile(path):
+            raise click.BadParameter("No such file: " + path, param_hint=option)
+        paths[name] = path
+    return paths
+
+
+@cli.command()
+@click.option(
+    "-i",
+    "--index",
+    "indices",
+    multiple=True,
+    metavar="NAME=PATH",
+    help="A weights file made by 'CAI build-index' to serve under a name. Can be "
+    "given more than once.",
+)
+@click.option(
+    "-r",
+    "--reference",
+    "references",
+    multiple=True,
+    metavar="NAME=PATH",
+    help="Reference sequences to serve the weights of under a name. Can be given "
+    "more than once.",
+)
+@click.option(
+    "-g",
+    "--genetic-code",
+    type=int,
+    default=11,
+    help="The genetic code of the reference sequences. Defaults to 11.",
+)
+@click.option(
+    "--host",
+    default="127.0.0.1",
+    help="The address to listen on. Defaults to 127.0.0.1.",
+)
+@click.option(
+    "--port", type=int, default=8000, help="The port to listen on. Defaults to 8000."
+)
+@click.option(
+    "--socket",
+    type=click.Path(dir_okay=False),
+    help="Listen on a Unix socket at this path instead of a port.",
+)
+@click.option(
+    "--queue-size",
+    type=int,
+    default=64,
+    help="The most requests waiting to be scored before more are turned away. "
+    "Defaults to 64.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    help="The number of threads scoring requests. Defaults to 1.",
+)
+def serve(indices, references, genetic_code, host, port, socket, queue_size, workers):
+    """Serves CAI scores over HTTP from weights loaded once at startup.
+
+    Send 'POST /score/NAME' requests with a JSON body of {"sequences": [...]}
+    to score sequences with the weights named NAME. 'GET /weights' lists the
+    names.
+    """
+    import asyncio
+    from .server import ScoringServer
+
+    if socket is not None and not hasattr(asyncio, "start_unix_server"):
+        raise click.UsageError("Unix sockets aren't available on this platform.")
+    indices = _named_paths(indices, "'-i' / '--index'")
+    references = _named_paths(references, "'-r' / '--reference'")
+    if not indices and not references:
+        raise click.UsageError(
+            "Provide at least one '-i' / '--index' or '-r' / '--reference'."
+        )
+
+    weights = {name: _load_index(path, None) for name, path in indices.items()}
+    for name, path in references.items():
+        weights[name], _ = _reference_weights(path, genetic_code, 1)
+    try:
+        server = ScoringServer(weights, queue_size=queue_size, workers=workers)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    def ready(listener):
+        address = socket or "http://{}:{}".format(
+            host, listener.sockets[0].getsockname()[1]
+        )
+        click.echo(
+            "Serving {} on {}".format(", ".join(sorted(weights)), address), err=True
+        )
+
+    server.run(host=host, port=port, path=socket, ready=ready)
 
 
 if __name__ == "__main__":
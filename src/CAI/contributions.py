@@ -0,0 +1,106 @@
+from collections import namedtuple
+import numpy as np
+from .CAI import (
+    Weights,
+    _CODONS,
+    _INVALID,
+    _codon_tables,
+)
+from .indices import _checked_count_matrix
+from .instrumentation import profiler
+
+CAIContributions = namedtuple(
+    "CAIContributions", ["by_codon", "by_amino_acid", "codons", "amino_acids"]
+)
+CAIContributions.__doc__ = """How much each codon and amino acid adds to the log CAI of each gene.
+
+The log CAI of a gene is the mean log weight of its counted codons, so it is
+the sum of the contribution of each codon,
+
+.. math::
+
+    \\frac{n_c \\ln w_c}{L}
+
+where :math:`n_c` is the number of times codon :math:`c` occurs in the gene.
+Every contribution is at most zero, and the most negative ones are the codons
+that pull the CAI down the most.
+
+Attributes:
+    by_codon (numpy.ndarray): The contribution of each codon (columns) to the
+        log CAI of each gene (rows). Each row sums to the log CAI of the gene,
+        and is nan for genes without a CAI.
+    by_amino_acid (numpy.ndarray): The contributions summed over the
+        synonymous codons of each amino acid.
+    codons (tuple): The codon of each column of ``by_codon``.
+    amino_acids (tuple): The amino acid of each column of ``by_amino_acid``.
+"""
+
+
+def _contributions(weights, counts):
+    """Splits the log CAI of each row of a codon count matrix up by codon."""
+    counts = counts[:, :_INVALID]
+    lengths = counts @ weights._counted[:_INVALID]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        by_codon = counts * (weights._log_weights[:_INVALID] / lengths[:, None])
+    # a codon that doesn't occur adds nothing, even with a weight of zero
+    by_codon[counts == 0] = 0
+    by_codon[lengths == 0] = np.nan
+
+    # the -inf of a codon with a weight of zero is summed on its own, since
+    # multiplying it by the zeros of the other amino acids would give nan
+    table = _codon_tables[weights.genetic_code]
+    amino_acids, groups = table["amino_acids"], table["groups"][:_INVALID]
+    zeros = np.isneginf(by_codon)
+    by_amino_acid = np.where(zeros, 0, by_codon) @ groups
+    by_amino_acid[(zeros @ groups) > 0] = -np.inf
+    return CAIContributions(
+        by_codon=by_codon,
+        by_amino_acid=by_amino_acid,
+        codons=_CODONS,
+        amino_acids=amino_acids,
+    )
+
+
+def CAI_contributions(
+    sequences,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    n_jobs=1,
+    ambiguous="error",
+):
+    r"""Works out which codons raise or lower the CAI of each of many genes.
+
+    The codons of every gene are counted into a matrix once, and the
+    contributions of all of the codons of all of the genes are then found with
+    one multiplication by the log weights. See :class:`CAIContributions`.
+
+    Args:
+        sequences (iterable): The DNA sequences of the genes.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        n_jobs (int, optional): The number of processes to count codons with. -1 uses one per CPU. Defaults to 1.
+        ambiguous (str, optional): Whether ambiguous codons are an ``"error"`` or
+            are left out (``"skip"`` or ``"count-as-invalid"``, which are the
+            same here). Defaults to ``"error"``.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`~CAI.Weights` object brings its own genetic code.
+
+    Returns:
+        CAIContributions: The contribution of each codon and amino acid to the
+        log CAI of each gene, in the order they were given.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When a sequence is empty or not divisible by three.
+        KeyError: When there is a missing weight for a codon.
+    """
+    weights = Weights(weights, RSCUs, reference, genetic_code)
+    counts = _checked_count_matrix(sequences, weights, ambiguous, n_jobs)
+    with profiler.stage("scoring", sequences=len(counts), codons=int(counts.sum())):
+        return _contributions(weights, counts)
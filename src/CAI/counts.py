@@ -0,0 +1,450 @@
+from collections import namedtuple
+import zipfile
+import numpy as np
+from .CAI import (
+    InvalidSequenceError,
+    Weights,
+    _CODONS,
+    _INVALID,
+    _RSCU_from_counts,
+    _count_matrix,
+    _length_problem,
+    _missing_weight_error,
+    relative_adaptiveness,
+)
+from .fasta import read_fasta
+from .indices import _CAI, _indices_from_counts
+from .instrumentation import profiler
+
+# identifies files written by CodonCountMatrix.save and the version of their layout
+_MATRIX_FORMAT = "CAI codon counts"
+_MATRIX_VERSION = 1
+
+RefinementStep = namedtuple(
+    "RefinementStep", ["iteration", "genes", "changed", "mean_CAI"]
+)
+RefinementStep.__doc__ = """How the reference set changed in one iteration of refinement.
+
+Attributes:
+    iteration (int): The number of the iteration, counting from one.
+    genes (int): The number of genes in the new reference set.
+    changed (int): The number of genes that joined or left the reference set.
+    mean_CAI (float): The mean CAI of the new reference set's genes, scored
+        against the weights of the previous one.
+"""
+
+ReferenceRefinement = namedtuple(
+    "ReferenceRefinement", ["reference", "weights", "history", "converged"]
+)
+ReferenceRefinement.__doc__ = """The result of :meth:`CodonCountMatrix.refine_reference`.
+
+Attributes:
+    reference (CodonCountMatrix): The genes of the final reference set.
+    weights (Weights): The weights of the final reference set.
+    history (list): A :class:`RefinementStep` for each iteration.
+    converged (bool): Whether the reference set stopped changing.
+"""
+
+
+def _memory_map(path, name, mode):
+    """Memory-maps an array stored uncompressed in an ``.npz`` file.
+
+    ``numpy.savez`` stores each array as an ``.npy`` file without compression,
+    so the array's data sits unchanged at some offset in the archive.
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, "rb") as f:
+        # skip the zip entry's local header, then the .npy header
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode=mode,
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+class CodonCountMatrix:
+    r"""The number of times each codon occurs in each of a set of genes.
+
+    The codons of every gene are counted once, after which the RSCU and weights
+    of any subset of the genes only take summing the subset's rows, and
+    scoring the genes only takes a product of the matrix with the log weights.
+
+    Args:
+        counts (numpy.ndarray): A matrix with a row for each gene and a column for
+            each codon in the order of :attr:`codons`, optionally followed by
+            a column of codons containing something other than A, C, G, T or U.
+        ids (list, optional): The ID of each gene. Defaults to the row numbers.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+
+    Raises:
+        ValueError: When the matrix has the wrong number of columns or there is
+            the wrong number of IDs.
+    """
+
+    #: The codon of each column of :attr:`counts`.
+    codons = _CODONS
+
+    def __init__(self, counts, ids=None, genetic_code=11):
+        counts = np.asarray(counts)
+        if counts.ndim != 2 or counts.shape[1] not in (_INVALID, _INVALID + 1):
+            raise ValueError("The counts must have a column for each codon")
+        if counts.shape[1] == _INVALID:
+            counts = np.hstack([counts, np.zeros((len(counts), 1), counts.dtype)])
+        if ids is None:
+            ids = np.arange(len(counts)).astype(str)
+        ids = np.asarray(ids, dtype=str)
+        if ids.shape != (len(counts),):
+            raise ValueError("There must be one ID for each row of counts")
+
+        self._counts = counts
+        self.ids = ids
+        self.genetic_code = genetic_code
+
+    @classmethod
+    def from_sequences(cls, sequences, ids=None, genetic_code=11, n_jobs=1):
+        """Counts the codons of each of a set of sequences.
+
+        Args:
+            sequences (iterable): The DNA sequences of the genes.
+            ids (list, optional): The ID of each gene. Defaults to the row numbers.
+            genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+            n_jobs (int, optional): The number of processes to count codons with. -1 uses one per CPU. Defaults to 1.
+
+        Returns:
+            CodonCountMatrix: A row of counts for each sequence.
+
+        Raises:
+            InvalidSequenceError: When a sequence is empty or not divisible by
+                three, giving its position and ID.
+        """
+
+        def validated(sequences):
+            for index, sequence in enumerate(sequences):
+                problem = _length_problem(len(sequence))
+                if problem is not None:
+                    raise InvalidSequenceError(
+                        problem, index, None if ids is None else ids[index]
+                    )
+                yield sequence
+
+        with profiler.stage("codon counting") as stage:
+            if n_jobs == 1:
+                counts = _count_matrix(validated(sequences))
+            else:
+                from ._parallel import map_chunks
+
+                counts = np.concatenate(
+                    [np.empty((0, _INVALID + 1), dtype=np.int64)]
+                    + list(map_chunks(_count_matrix, validated(sequences), n_jobs))
+                )
+            stage.count(sequences=len(counts), codons=int(counts.sum()))
+        return cls(counts, ids, genetic_code)
+
+    @classmethod
+    def from_fasta(cls, path, genetic_code=11, n_jobs=1):
+        """Counts the codons of each record of a FASTA file.
+
+        Args:
+            path (str): The FASTA file to read.
+            genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+            n_jobs (int, optional): The number of processes to count codons with. -1 uses one per CPU. Defaults to 1.
+
+        Returns:
+            CodonCountMatrix: A row of counts for each record, with the record IDs.
+
+        Raises:
+            InvalidSequenceError: When a sequence is empty or not divisible by
+                three, giving its position and ID.
+        """
+        ids = []
+
+        # the IDs are collected as the records are read, so they are there to
+        # report a record that fails validation
+        def sequences():
+            for name, sequence in read_fasta(path):
+                ids.append(name)
+                yield sequence
+
+        return cls.from_sequences(sequences(), ids, genetic_code, n_jobs)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __repr__(self):
+        return "CodonCountMatrix(genes={}, genetic_code={})".format(
+            len(self), self.genetic_code
+        )
+
+    def __getitem__(self, genes):
+        """Selects a subset of the genes.
+
+        Args:
+            genes: A slice, an array of row numbers or booleans, or a list of IDs.
+
+        Returns:
+            CodonCountMatrix: The selected rows, which share memory with this
+            matrix when selected with a slice.
+
+        Raises:
+            KeyError: When an ID isn't in the matrix.
+        """
+        if not isinstance(genes, slice):
+            genes = self._rows(genes)
+        return type(self)(self._counts[genes], self.ids[genes], self.genetic_code)
+
+    def _rows(self, genes):
+        """Turns a selection of genes into an array of row numbers."""
+        if isinstance(genes, slice):
+            return np.arange(len(self))[genes]
+        genes = np.atleast_1d(genes)
+        if genes.dtype.kind in "US":
+            rows = {name: i for i, name in reversed(list(enumerate(self.ids)))}
+            return np.array([rows[name] for name in genes], dtype=np.intp)
+        if genes.dtype == bool:
+            return np.flatnonzero(genes)
+        return genes.astype(np.intp)
+
+    @property
+    def counts(self):
+        """numpy.ndarray: The count of each codon (columns) in each gene (rows)."""
+        return self._counts[:, :_INVALID]
+
+    @property
+    def invalid(self):
+        """numpy.ndarray: The number of codons in each gene containing something other than A, C, G, T or U."""
+        return self._counts[:, _INVALID]
+
+    def total(self):
+        """Returns the count of each codon summed over all of the genes."""
+        return self.counts.sum(axis=0)
+
+    def RSCU(self):
+        """Calculates the RSCU of all of the genes together.
+
+        Returns:
+            dict: The relative synonymous codon usage. See :func:`~CAI.RSCU` for details.
+        """
+        with profiler.stage("RSCU"):
+            return _RSCU_from_counts(self.total(), self.genetic_code)
+
+    def relative_adaptiveness(self):
+        """Calculates the weight of each codon with all of the genes as the reference.
+
+        Returns:
+            dict: A mapping between each codon and its weight. See :func:`~CAI.relative_adaptiveness` for details.
+        """
+        return relative_adaptiveness(RSCUs=self.RSCU(), genetic_code=self.genetic_code)
+
+    def weights(self):
+        """Returns the :class:`~CAI.Weights` of all of the genes as the reference."""
+        return Weights(RSCUs=self.RSCU(), genetic_code=self.genetic_code)
+
+    def _check_weights(self, weights, RSCUs, reference, ambiguous):
+        weights = Weights(weights, RSCUs, reference, self.genetic_code)
+        codons = weights._missing_for(ambiguous)
+        missing = self._counts[:, codons].any(axis=0)
+        if missing.any():
+            codon = np.flatnonzero(codons)[np.argmax(missing)]
+            raise _missing_weight_error(
+                _CODONS[codon]
+                if codon < _INVALID
+                else "with something other than A, C, G, T or U"
+            )
+        return weights
+
+    def CAI(self, weights=None, RSCUs=None, reference=None, ambiguous="error"):
+        """Calculates the CAI of each gene.
+
+        Args:
+            weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+            RSCUs (dict, optional): The RSCU of the reference set.
+            reference (list): The reference set of sequences.
+            ambiguous (str, optional): Whether ambiguous codons are an
+                ``"error"`` or are left out (``"skip"`` or ``"count-as-invalid"``,
+                which are the same here). Defaults to ``"error"``. The number of
+                them in each gene is :attr:`invalid`.
+
+        Note:
+            One of ``weights``, ``reference`` or ``RSCUs`` is required.
+
+        Returns:
+            numpy.ndarray: The CAI of each gene, as :func:`~CAI.CAI_batch` gives it.
+
+        Raises:
+            TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+            KeyError: When there is a missing weight for a codon.
+        """
+        weights = self._check_weights(weights, RSCUs, reference, ambiguous)
+        with profiler.stage("scoring", sequences=len(self)):
+            return _CAI(weights, self._counts)
+
+    def indices(
+        self,
+        weights=None,
+        RSCUs=None,
+        reference=None,
+        optimal_codons=None,
+        ambiguous="error",
+    ):
+        """Calculates the CAI, ENC, Fop, CBI and GC3 of each gene.
+
+        See :func:`~CAI.codon_indices` for details.
+
+        Returns:
+            CodonIndices: An array of each index with a value for each gene.
+        """
+        weights = self._check_weights(weights, RSCUs, reference, ambiguous)
+        return _indices_from_counts(weights, self._counts, optimal_codons)
+
+    def contributions(
+        self, weights=None, RSCUs=None, reference=None, ambiguous="error"
+    ):
+        """Works out how much each codon adds to the log CAI of each gene.
+
+        See :func:`~CAI.CAI_contributions` for details.
+
+        Returns:
+            CAIContributions: The contribution of each codon and amino acid to the
+            log CAI of each gene.
+        """
+        from .contributions import _contributions
+
+        weights = self._check_weights(weights, RSCUs, reference, ambiguous)
+        with profiler.stage("scoring", sequences=len(self)):
+            return _contributions(weights, self._counts)
+
+    def refine_reference(self, initial=None, fraction=0.01, max_iterations=20):
+        """Finds a reference set of highly expressed genes when none is known.
+
+        Starting from an initial set of genes (such as the ribosomal proteins),
+        each iteration works out the weights of the current reference set,
+        scores every gene with them and takes the ``fraction`` of genes with the
+        highest CAI as the next reference set. This stops once the set no longer
+        changes or after ``max_iterations``.
+
+        Since the codons are already counted, an iteration only sums the rows of
+        the reference set and multiplies the matrix by the log weights.
+
+        Args:
+            initial (optional): The genes to start with, selected as with
+                ``matrix[initial]``. Defaults to all of the genes.
+            fraction (float, optional): The fraction of genes kept as the
+                reference set. Defaults to 0.01, with at least one gene kept.
+            max_iterations (int, optional): The most iterations to run. Defaults to 20.
+
+        Returns:
+            ReferenceRefinement: The final reference set and its weights, a
+            :class:`RefinementStep` for each iteration and whether the set
+            converged.
+
+        Raises:
+            ValueError: When ``fraction`` isn't between zero and one or
+                ``max_iterations`` isn't positive.
+        """
+        if not 0 < fraction <= 1:
+            raise ValueError("The fraction must be between zero and one")
+        if max_iterations < 1:
+            raise ValueError("There must be at least one iteration")
+
+        selected = np.unique(self._rows(slice(None) if initial is None else initial))
+        keep = max(1, int(round(fraction * len(self))))
+
+        history = []
+        converged = False
+        for iteration in range(1, max_iterations + 1):
+            weights = self[selected].weights()
+            scores = _CAI(weights, self._counts)
+
+            # the highest scores first, with genes without a CAI last
+            order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind="stable")
+            chosen = np.sort(order[:keep])
+            changed = len(np.setxor1d(selected, chosen))
+            history.append(
+                RefinementStep(
+                    iteration, len(chosen), changed, float(np.mean(scores[chosen]))
+                )
+            )
+            selected = chosen
+            if not changed:
+                converged = True
+                break
+
+        reference = self[selected]
+        return ReferenceRefinement(reference, reference.weights(), history, converged)
+
+    def save(self, path):
+        """Saves the matrix to an ``.npz`` file that can be read back with :meth:`load`.
+
+        Args:
+            path (str): Where to write the file. It is written to exactly this
+                path, without adding an ``.npz`` suffix as :func:`numpy.savez`
+                would.
+        """
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                counts=self._counts,
+                ids=self.ids,
+                genetic_code=self.genetic_code,
+                format=_MATRIX_FORMAT,
+                version=_MATRIX_VERSION,
+            )
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """Reads a matrix saved with :meth:`save`.
+
+        Args:
+            path (str): The file to read.
+            mmap_mode (str, optional): Memory-map the counts instead of reading
+                them into memory, with a mode of 'r' (read-only) or 'c'
+                (copy-on-write) as for :func:`numpy.load`. Modes that write to
+                the file aren't allowed, since they would spoil the archive's
+                checksum.
+
+        Returns:
+            CodonCountMatrix: The saved matrix.
+
+        Raises:
+            ValueError: When the file wasn't written by :meth:`save` or by a newer
+                version of CAI, or ``mmap_mode`` isn't 'r' or 'c'.
+        """
+        if mmap_mode not in (None, "r", "c"):
+            raise ValueError(
+                "Codon count files can only be memory-mapped with mode 'r' or 'c'"
+            )
+        try:
+            saved = np.load(path)
+        except ValueError:
+            saved = None
+        if not isinstance(saved, np.lib.npyio.NpzFile):
+            raise ValueError(str(path) + " is not a CAI codon count file")
+        with saved:
+            if "format" not in saved.files or str(saved["format"]) != _MATRIX_FORMAT:
+                raise ValueError(str(path) + " is not a CAI codon count file")
+            if int(saved["version"]) > _MATRIX_VERSION:
+                raise ValueError(
+                    str(path)
+                    + " was written by a newer version of CAI and can't be read"
+                )
+            counts = None
+            if mmap_mode is not None:
+                counts = _memory_map(path, "counts", mmap_mode)
+            if counts is None:
+                counts = saved["counts"]
+            return cls(counts, saved["ids"], int(saved["genetic_code"]))
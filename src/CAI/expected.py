@@ -0,0 +1,198 @@
+from collections import namedtuple
+import numpy as np
+from .CAI import (
+    Weights,
+    _CODON_NUCLEOTIDES,
+    _INVALID,
+    _PerGeneticCode,
+    _codon_tables,
+)
+
+ExpectedCAI = namedtuple(
+    "ExpectedCAI", ["CAI", "expected", "std", "upper", "z_score", "p_value"]
+)
+ExpectedCAI.__doc__ = """The CAI of a gene compared with random genes of the same composition.
+
+Attributes:
+    CAI (float): The CAI of the gene.
+    expected (float): The mean CAI of the random genes.
+    std (float): The standard deviation of the CAI of the random genes.
+    upper (float): The 95th percentile of the CAI of the random genes. A CAI
+        above it is significantly higher than the composition alone explains.
+    z_score (float): How many standard deviations the CAI is above the mean.
+    p_value (float): The fraction of random genes with at least the gene's CAI,
+        counting the gene itself.
+"""
+
+
+def _find_group_members(genetic_code):
+    """Lists the codons of each synonymous group, padded with ``_INVALID``.
+
+    The groups are the rows of the ``amino_acid`` lookup of the codon table,
+    which hold the same codons as ``_synonymous_codons`` does for each amino
+    acid, plus a group for the stop codons.
+    """
+    amino_acid = _codon_tables[genetic_code]["amino_acid"][:_INVALID]
+    sizes = np.bincount(amino_acid)
+    members = np.full((len(sizes), sizes.max()), _INVALID, dtype=np.intp)
+    for group in range(len(sizes)):
+        codons = np.flatnonzero(amino_acid == group)
+        members[group, : len(codons)] = codons
+    return members
+
+
+_group_members = _PerGeneticCode(_find_group_members)
+
+
+def _simulate(weights, codons, simulations, rng):
+    """Works out the CAI of random genes with the composition of an encoded gene.
+
+    Each random gene keeps the amino acid of every counted codon of the gene and
+    picks one of its synonymous codons with a probability proportional to the
+    product of the frequencies of its nucleotides at each codon position in the
+    gene.
+
+    Returns:
+        tuple: The CAI of the gene and an array with that of each random gene.
+    """
+    counted = codons[weights._counted[codons]]
+    if not len(counted):
+        return float("nan"), np.full(simulations, np.nan)
+    observed = float(np.exp(np.mean(weights._log_weights[counted])))
+
+    # the frequency of each nucleotide at each codon position, over the codons
+    # made of A, C, G and T only
+    nucleotides = _CODON_NUCLEOTIDES[codons[codons != _INVALID]]
+    frequencies = np.stack(
+        [np.bincount(column, minlength=4) for column in nucleotides.T]
+    )
+    probabilities = np.zeros(_INVALID + 1)
+    probabilities[:_INVALID] = np.prod(
+        frequencies[np.arange(3), _CODON_NUCLEOTIDES], axis=1
+    )
+    probabilities *= weights._counted
+
+    # the cumulative probability of each codon within its synonymous group,
+    # which is never zero for a group the gene uses since its own codon counts
+    members = _group_members[weights.genetic_code]
+    cumulative = np.cumsum(probabilities[members], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cumulative /= cumulative[:, -1:]
+
+    # pick the synonymous codons of every random gene at once by counting the
+    # codons whose cumulative probability each draw passes, a column at a time
+    # (the last is always 1), then gather their log weights and average them
+    groups = _codon_tables[weights.genetic_code]["amino_acid"][counted]
+    cumulative = cumulative[groups]
+    draws = rng.random((simulations, len(counted)))
+    choices = np.zeros(draws.shape, dtype=np.uint8)
+    for column in cumulative[:, :-1].T:
+        choices += draws >= column
+    log_weights = weights._log_weights[members][groups, choices]
+    return observed, np.exp(np.mean(log_weights, axis=1))
+
+
+def _summarize(observed, simulated):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = float(np.mean(simulated))
+        std = float(np.std(simulated, ddof=1)) if len(simulated) > 1 else 0.0
+        return ExpectedCAI(
+            CAI=observed,
+            expected=expected,
+            std=std,
+            upper=float(np.percentile(simulated, 95)),
+            z_score=(observed - expected) / std if std else float("nan"),
+            p_value=(
+                float((np.sum(simulated >= observed) + 1) / (len(simulated) + 1))
+                if not np.isnan(observed)
+                else float("nan")
+            ),
+        )
+
+
+def expected_CAI(
+    sequence,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    simulations=1000,
+    random_state=None,
+):
+    r"""Compares the CAI of a gene with that of random genes of the same composition.
+
+    A high CAI only means that a gene is adapted to the reference set if it
+    isn't explained by the gene's nucleotide and amino acid composition alone.
+    The expected CAI (eCAI) is found by simulating random genes that code for
+    the same amino acids as the gene, choosing between synonymous codons in
+    proportion to the frequency of their nucleotides at each codon position in
+    the gene. The simulations are done on codon indices and scored all at once,
+    so 1000 of them cost about as much as scoring the gene 1000 times over with
+    :meth:`Weights.score_many`.
+
+    Args:
+        sequence (str): The DNA sequence to test.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        simulations (int, optional): The number of random genes. Defaults to 1000.
+        random_state (int or numpy.random.Generator, optional): The seed or
+            random number generator to simulate with.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`~CAI.Weights` object brings its own genetic code.
+
+    Returns:
+        ExpectedCAI: The CAI of the gene and how it compares with the random
+        genes. Everything is nan if the gene only has codons without synonyms.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When the sequence is empty or not divisible by three or
+            ``simulations`` isn't positive.
+        KeyError: When there is a missing weight for a codon.
+    """
+    return expected_CAI_batch(
+        [sequence],
+        weights,
+        RSCUs,
+        reference,
+        genetic_code,
+        simulations=simulations,
+        random_state=random_state,
+    )[0]
+
+
+def expected_CAI_batch(
+    sequences,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    simulations=1000,
+    random_state=None,
+):
+    r"""Runs :func:`expected_CAI` on many genes, working out the weights only once.
+
+    Args:
+        sequences (iterable): The DNA sequences to test.
+        simulations (int, optional): The number of random genes per gene. Defaults to 1000.
+        random_state (int or numpy.random.Generator, optional): The seed or
+            random number generator to simulate with.
+
+    See :func:`expected_CAI` for the other arguments.
+
+    Returns:
+        list: An :class:`ExpectedCAI` for each sequence, in the order they were
+        given.
+    """
+    if simulations < 1:
+        raise ValueError("The number of simulations must be positive")
+    weights = Weights(weights, RSCUs, reference, genetic_code)
+    rng = np.random.default_rng(random_state)
+    return [
+        _summarize(*_simulate(weights, weights._encode(sequence), simulations, rng))
+        for sequence in sequences
+    ]
@@ -0,0 +1,225 @@
+from collections import namedtuple
+import numpy as np
+from .CAI import (
+    InvalidSequenceError,
+    Weights,
+    _CODONS,
+    _INVALID,
+    _codon_index,
+    _codon_tables,
+    _count_matrix,
+    _length_problem,
+)
+from .instrumentation import profiler
+
+CodonIndices = namedtuple("CodonIndices", ["CAI", "ENC", "Fop", "CBI", "GC3"])
+CodonIndices.__doc__ = """Codon usage indices of a batch of genes, one array per index.
+
+Attributes:
+    CAI (numpy.ndarray): The codon adaptation index, as :func:`~CAI.CAI_batch`
+        gives it.
+    ENC (numpy.ndarray): The effective number of codons.
+    Fop (numpy.ndarray): The frequency of optimal codons.
+    CBI (numpy.ndarray): The codon bias index.
+    GC3 (numpy.ndarray): The fraction of codons with G or C in the third
+        position.
+"""
+
+# whether the third nucleotide of each codon index is G or C
+_GC3 = np.array([codon[2] in "GC" for codon in _CODONS] + [False])
+
+
+def _CAI(weights, counts):
+    """Calculates the CAI of each row of a codon count matrix."""
+    zero = np.isneginf(weights._log_weights)
+    log_weights = np.where(zero, 0, weights._log_weights)
+    totals = counts @ log_weights
+    lengths = counts @ weights._counted
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cai = np.exp(totals / lengths)
+    # a single codon with a weight of zero makes the geometric mean zero
+    cai[(counts[:, zero] > 0).any(axis=1) & (lengths > 0)] = 0
+    return cai
+
+
+def _ENC(counts, genetic_code):
+    r"""Calculates the effective number of codons of each row of a count matrix.
+
+    Following Wright (1990), the homozygosity of each amino acid is
+
+    .. math::
+
+        F = \frac{n\sum p_i^2 - 1}{n - 1}
+
+    where :math:`n` is the number of times the amino acid occurs and
+    :math:`p_i` the frequency of each of its codons. The ENC is the number of
+    amino acids with one codon plus, for each other degeneracy class, the
+    number of amino acids in the class divided by their average :math:`F`. A
+    missing class of three-fold amino acids (isoleucine) takes the average of
+    the two- and four-fold classes, any other missing class makes the ENC nan,
+    and the ENC is capped at the number of sense codons.
+    """
+    groups = _codon_tables[genetic_code]["groups"]
+    sizes = groups.sum(axis=0)
+
+    n = counts @ groups
+    squares = (counts.astype(float) ** 2) @ groups
+    with np.errstate(divide="ignore", invalid="ignore"):
+        F = np.where(n > 1, (squares / n - 1) / (n - 1), 0)
+
+        # average F over the amino acids of each degeneracy class that occur
+        # more than once
+        averages = {}
+        for size in np.unique(sizes[sizes > 1]):
+            in_class = (n > 1)[:, sizes == size]
+            averages[size] = F[:, sizes == size].sum(axis=1) / in_class.sum(axis=1)
+        if 2 in averages and 3 in averages and 4 in averages:
+            averages[3] = np.where(
+                np.isnan(averages[3]), (averages[2] + averages[4]) / 2, averages[3]
+            )
+
+        enc = np.full(len(counts), float(np.sum(sizes == 1)))
+        for size, average in averages.items():
+            enc += np.sum(sizes == size) / average
+    return np.minimum(enc, sizes.sum())
+
+
+def _optimal(weights, optimal_codons):
+    """Picks out the optimal codons, defaulting to those with a weight of one."""
+    synonymous = _codon_tables[weights.genetic_code]["synonymous"]
+    if optimal_codons is None:
+        return synonymous & (weights._weights == 1)
+    optimal = np.zeros(_INVALID + 1, dtype=bool)
+    for codon in optimal_codons:
+        i = _codon_index(codon)
+        if i is None:
+            raise KeyError(codon)
+        optimal[i] = True
+    return synonymous & optimal
+
+
+def _Fop_and_CBI(counts, genetic_code, optimal):
+    """Calculates the Fop and CBI of each row of a codon count matrix.
+
+    Only amino acids with at least one optimal codon are taken into account.
+    Fop is the fraction of their codons that are optimal (Ikemura, 1981). CBI
+    compares the number of optimal codons with the number expected if
+    synonymous codons were used at random (Bennetzen and Hall, 1982).
+    """
+    table = _codon_tables[genetic_code]
+    amino_acid = table["amino_acid"]
+    included = table["synonymous"] & np.isin(amino_acid, amino_acid[optimal])
+
+    # the chance that a codon of each amino acid is optimal when chosen at random
+    sizes = np.bincount(amino_acid, weights=included)
+    optimal_sizes = np.bincount(amino_acid, weights=optimal, minlength=len(sizes))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        random = np.where(included, optimal_sizes[amino_acid] / sizes[amino_acid], 0)
+
+        total = counts @ included
+        observed = counts @ optimal
+        expected = counts @ random
+        return observed / total, (observed - expected) / (total - expected)
+
+
+def codon_indices(
+    sequences,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    optimal_codons=None,
+    n_jobs=1,
+    ambiguous="error",
+):
+    r"""Calculates the CAI, ENC, Fop, CBI and GC3 of many genes in one pass.
+
+    The codons of each gene are counted once into a row of a matrix with a
+    column for each codon, and every index is then worked out for all of the
+    genes at once from that matrix.
+
+    Args:
+        sequences (iterable): The DNA sequences of the genes.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        optimal_codons (iterable, optional): The optimal codons for Fop and CBI. Defaults to the codon with the highest weight for each amino acid with synonymous codons.
+        n_jobs (int, optional): The number of processes to count codons with. -1 uses one per CPU. Defaults to 1.
+        ambiguous (str, optional): Whether ambiguous codons are an ``"error"`` or
+            are left out of every index (``"skip"`` or ``"count-as-invalid"``,
+            which are the same here). Defaults to ``"error"``.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`~CAI.Weights` object brings its own genetic code.
+
+    Returns:
+        CodonIndices: An array of each index with a value for each gene, in the
+        order they were given. Indices that are undefined for a gene (such as
+        the CAI of a gene of codons without synonyms) are nan.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When a sequence is empty or not divisible by three.
+        KeyError: When there is a missing weight for a codon.
+    """
+    weights = Weights(weights, RSCUs, reference, genetic_code)
+    counts = _checked_count_matrix(sequences, weights, ambiguous, n_jobs)
+    return _indices_from_counts(weights, counts, optimal_codons)
+
+
+def _checked_count_matrix(sequences, weights, ambiguous, n_jobs):
+    """Validates sequences and counts their codons into a matrix.
+
+    Returns:
+        numpy.ndarray: The count matrix, as :func:`~CAI.CAI._count_matrix` gives it.
+
+    Raises:
+        InvalidSequenceError: When a sequence is empty or not divisible by three.
+        KeyError: When there is a missing weight for a codon.
+    """
+    missing = weights._missing_for(ambiguous)
+
+    with profiler.stage("validation") as stage:
+        sequences = list(sequences)
+        for index, sequence in enumerate(sequences):
+            problem = _length_problem(len(sequence))
+            if problem is not None:
+                raise InvalidSequenceError(problem, index)
+        stage.count(sequences=len(sequences))
+
+    with profiler.stage("codon counting", sequences=len(sequences)) as stage:
+        if n_jobs == 1:
+            counts = _count_matrix(sequences)
+        else:
+            from ._parallel import map_chunks
+
+            counts = np.concatenate(
+                [np.empty((0, _INVALID + 1), dtype=np.int64)]
+                + list(map_chunks(_count_matrix, sequences, n_jobs))
+            )
+        stage.count(codons=int(counts.sum()))
+
+    # encoding the first sequence with a codon without a weight raises the error
+    missing = counts[:, missing].any(axis=1)
+    if missing.any():
+        row = int(np.argmax(missing))
+        weights._encode(sequences[row], ambiguous, row)
+    return counts
+
+
+def _indices_from_counts(weights, counts, optimal_codons=None):
+    """Calculates every index from a codon count matrix. See :func:`codon_indices`."""
+    optimal = _optimal(weights, optimal_codons)
+    with profiler.stage("scoring", sequences=len(counts), codons=int(counts.sum())):
+        Fop, CBI = _Fop_and_CBI(counts, weights.genetic_code, optimal)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            GC3 = (counts @ _GC3) / counts[:, :_INVALID].sum(axis=1)
+        return CodonIndices(
+            CAI=_CAI(weights, counts),
+            ENC=_ENC(counts, weights.genetic_code),
+            Fop=Fop,
+            CBI=CBI,
+            GC3=GC3,
+        )
@@ -0,0 +1,161 @@
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import threading
+import time
+
+StageStats = namedtuple("StageStats", ["calls", "seconds", "sequences", "codons"])
+
+
+class _Stage:
+    """Times one pass through a stage and adds it to the profiler on exit."""
+
+    __slots__ = ("_profiler", "_name", "_sequences", "_codons", "_start")
+
+    def __init__(self, profiler, name, sequences, codons):
+        self._profiler = profiler
+        self._name = name
+        self._sequences = sequences
+        self._codons = codons
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profiler.record(
+            self._name,
+            time.perf_counter() - self._start,
+            self._sequences,
+            self._codons,
+        )
+
+    def count(self, sequences=0, codons=0):
+        """Adds to the sequences and codons processed in this pass."""
+        self._sequences += sequences
+        self._codons += codons
+
+
+class _NullStage:
+    """Stands in for :class:`_Stage` while profiling is off, doing nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def count(self, sequences=0, codons=0):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """Records how long each stage of the work takes and how much it processes.
+
+    The profiler starts out disabled, in which case timing a stage does nothing
+    at all. Once turned on with :meth:`enable`, every pass through a stage adds
+    its wall time and the number of sequences and codons it processed to that
+    stage's totals.
+
+    Work done in worker processes (``n_jobs``) is timed as a whole by the
+    stage that started it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = OrderedDict()
+        self.enabled = False
+
+    def enable(self):
+        """Turns profiling on, keeping any totals recorded so far."""
+        self.enabled = True
+
+    def disable(self):
+        """Turns profiling off, keeping the totals recorded so far."""
+        self.enabled = False
+
+    def reset(self):
+        """Clears the totals of every stage."""
+        with self._lock:
+            self._stats.clear()
+
+    def stage(self, name, sequences=0, codons=0):
+        """Returns a context manager timing a pass through a stage.
+
+        Args:
+            name (str): The name of the stage.
+            sequences (int, optional): The number of sequences processed.
+            codons (int, optional): The number of codons processed.
+
+        The counts can also be added to with ``count(sequences, codons)`` on
+        the object the ``with`` statement gives.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, sequences, codons)
+
+    def record(self, name, seconds, sequences=0, codons=0):
+        """Adds one pass through a stage to its totals."""
+        with self._lock:
+            calls, total, total_sequences, total_codons = self._stats.get(
+                name, (0, 0.0, 0, 0)
+            )
+            self._stats[name] = StageStats(
+                calls + 1,
+                total + seconds,
+                total_sequences + sequences,
+                total_codons + codons,
+            )
+
+    def stats(self):
+        """Returns the totals of each stage, in the order they were first seen.
+
+        Returns:
+            dict: A :class:`StageStats` tuple of the number of calls, wall time in
+            seconds, sequences and codons for each stage.
+        """
+        with self._lock:
+            return OrderedDict(self._stats)
+
+    def report(self):
+        """Formats the totals of each stage as a table."""
+        lines = [
+            "{:<24}{:>8}{:>12}{:>12}{:>14}".format(
+                "stage", "calls", "seconds", "sequences", "codons"
+            )
+        ]
+        for name, stats in self.stats().items():
+            lines.append("{:<24}{:>8}{:>12.4f}{:>12}{:>14}".format(name, *stats))
+        return "\n".join(lines)
+
+
+# the profiler used throughout the package
+profiler = Profiler()
+
+
+@contextmanager
+def profiling():
+    """Profiles everything done inside a ``with`` block.
+
+    The totals are cleared on entry and the profiler is turned back off on exit
+    unless it was already on::
+
+        with profiling() as profiler:
+            CAI_batch(genes, reference=reference)
+        stats = profiler.stats()
+
+    Yields:
+        Profiler: The package's profiler.
+    """
+    was_enabled = profiler.enabled
+    profiler.reset()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        if not was_enabled:
+            profiler.disable()
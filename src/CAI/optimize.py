@@ -0,0 +1,402 @@
+from itertools import chain
+import numpy as np
+from .CAI import (
+    Weights,
+    _CODONS,
+    _CODON_INDEX,
+    _CODON_NUCLEOTIDES,
+    _NUCLEOTIDES,
+    _as_bytes,
+    _PerGeneticCode,
+    _genetic_code,
+    _synonymous_codons,
+)
+
+# whether each nucleotide of each codon is a G or C, and the number of G and C
+# nucleotides in the first and last one, two and three nucleotides of each codon
+_CODON_GC = np.isin(_CODON_NUCLEOTIDES, (1, 2)).astype(np.int64)
+_CODON_GC_PREFIX = np.cumsum(_CODON_GC, axis=1)
+_CODON_GC_SUFFIX = np.cumsum(_CODON_GC[:, ::-1], axis=1)
+
+# the last few nucleotides of a partial sequence are kept as the digits of an
+# integer in base five, with the extra digit standing in for nucleotides before
+# the start. 27 digits is as many as fit in 64 bits
+_KEY_DIGITS = 27
+_CODON_DIGITS = (
+    _CODON_NUCLEOTIDES.astype(np.uint64) * np.array([25, 5, 1], dtype=np.uint64)
+).sum(axis=1, dtype=np.uint64)
+
+
+def _find_amino_acid_codons(genetic_code):
+    """Maps each amino acid (and * for stop) to the indices of its codons."""
+    forward_table = _genetic_code(genetic_code).forward_table
+    codons = {
+        forward_table[codon]: sorted(_CODON_INDEX[c] for c in synonyms)
+        for codon, synonyms in _synonymous_codons[genetic_code].items()
+    }
+    codons["*"] = sorted(
+        _CODON_INDEX[c] for c in _genetic_code(genetic_code).stop_codons
+    )
+    return {amino_acid: np.array(c) for amino_acid, c in codons.items()}
+
+
+_amino_acid_codons = _PerGeneticCode(_find_amino_acid_codons)
+
+
+def _site(site):
+    values = _NUCLEOTIDES[_as_bytes(site)]
+    if not len(values) or (values > 3).any():
+        raise ValueError(
+            "Sites to avoid must only contain A, C, G and T: {!r}".format(site)
+        )
+    return values
+
+
+def _digits(nucleotides):
+    """Reads nucleotides as a number in base five, the last being the units."""
+    return sum(int(n) * 5**i for i, n in enumerate(reversed(nucleotides)))
+
+
+class _Optimizer:
+    """Finds the highest scoring coding sequence for proteins under constraints.
+
+    Partial sequences are extended one codon at a time, keeping the
+    ``beam_width`` best. The best partial sequence for each distinct ending goes
+    first, so the beam doesn't fill up with sequences that only differ far back
+    and can't get round a constraint. Candidates that would leave no way to
+    satisfy the constraints at the next codon, or in the GC content windows
+    still to come, are dropped early.
+
+    All the state is plain arrays so the optimizer can be sent to other
+    processes.
+    """
+
+    def __init__(
+        self, weights, gc_content, gc_window, avoid, max_homopolymer, beam_width
+    ):
+        if beam_width < 1:
+            raise ValueError("The beam width must be positive")
+        if max_homopolymer is not None and max_homopolymer < 1:
+            raise ValueError("The longest homopolymer must be positive")
+        if gc_content is not None and gc_window < 3:
+            raise ValueError("The GC content window must be at least a codon long")
+
+        # codons without a weight can't be scored, so are never chosen
+        self.log_weights = np.where(weights._missing, -np.inf, weights._log_weights)
+        self.amino_acid_codons = _amino_acid_codons[weights.genetic_code]
+        self.beam_width = beam_width
+
+        # sites are avoided on both strands. A homopolymer that's too long is
+        # just another site to avoid
+        sites = [_site(site) for site in avoid]
+        sites += [(3 - site)[::-1] for site in sites]
+        if max_homopolymer is not None:
+            sites += [np.full(max_homopolymer + 1, n) for n in range(4)]
+
+        # how many nucleotides of each partial sequence are remembered
+        self.local = max([6] + [len(site) + 2 for site in sites])
+        if self.local > _KEY_DIGITS:
+            raise ValueError(
+                "Sites to avoid and the longest homopolymer must be shorter than "
+                "{} nucleotides".format(_KEY_DIGITS - 2)
+            )
+
+        # the windows of the key that can hold a site ending in the last codon,
+        # and each site in the same form. Adding 5 ** length tells sites of
+        # different lengths apart
+        lengths = sorted({len(site) for site in sites})
+        self.divisors = np.array(
+            [5**shift for _ in lengths for shift in range(3)], dtype=np.uint64
+        )
+        self.moduli = np.array(
+            [5**length for length in lengths for _ in range(3)], dtype=np.uint64
+        )
+        self.sites = np.unique(
+            np.array(
+                [_digits(site) + 5 ** len(site) for site in sites], dtype=np.uint64
+            )
+        )
+
+        self.gc_content = gc_content
+        self.gc_window = gc_window
+
+    @property
+    def constrained(self):
+        return bool(len(self.sites)) or self.gc_content is not None
+
+    def _options(self, amino_acid):
+        try:
+            return self.amino_acid_codons[amino_acid]
+        except KeyError:
+            raise ValueError("Unknown amino acid: " + amino_acid)
+
+    def _extend(self, keys, codons):
+        """Adds a codon to the end of each key, dropping the oldest nucleotides."""
+        kept = keys % np.uint64(5 ** (self.local - 3))
+        return kept * np.uint64(125) + _CODON_DIGITS[codons]
+
+    def _clear(self, keys):
+        """Checks that no site ends in the last codon of each key."""
+        if not len(self.sites):
+            return np.ones(len(keys), dtype=bool)
+        windows = keys[:, None] // self.divisors % self.moduli + self.moduli
+        found = np.searchsorted(self.sites, windows)
+        found = self.sites[np.minimum(found, len(self.sites) - 1)] == windows
+        return ~found.any(axis=1)
+
+    def _gc_bounds(self, protein):
+        """Works out the fewest and most G and C nucleotides the protein can have.
+
+        Returns the fewest and most in the first ``n`` nucleotides for each ``n``.
+        """
+        low, high = [], []
+        for options in map(self._options, protein):
+            usable = options[np.isfinite(self.log_weights[options])]
+            gc = np.cumsum(_CODON_GC[usable if len(usable) else options], axis=1)
+            low.append(gc.min(axis=0))
+            high.append(gc.max(axis=0))
+
+        bounds = []
+        for codon_bounds in (np.array(low), np.array(high)):
+            codons = np.concatenate([[0], np.cumsum(codon_bounds[:, 2])])
+            bounds.append(
+                np.concatenate([[0], (codons[:-1, None] + codon_bounds).ravel()])
+            )
+        return bounds
+
+    def _gc_limits(self, window):
+        """Turns the GC content range into numbers of G and C nucleotides in a window."""
+        return (
+            int(np.ceil(self.gc_content[0] * window - 1e-9)),
+            int(np.floor(self.gc_content[1] * window + 1e-9)),
+        )
+
+    def _gc_allowed(self, suffixes, parents, codons, position, bounds, limits):
+        """Checks the GC content of the windows ending in and after each codon.
+
+        ``suffixes`` has the number of G and C nucleotides in the last 0 up to
+        the window's length nucleotides of each partial sequence.
+
+        Returns:
+            tuple: Whether each candidate is allowed, and its ``suffixes``.
+        """
+        window = suffixes.shape[1] - 1
+        length = 3 * (position + 1)
+        lowest, highest = limits
+        previous = suffixes[parents]
+        suffixes = np.empty_like(previous)
+        suffixes[:, 0] = 0
+        suffixes[:, 1:4] = _CODON_GC_SUFFIX[codons]
+        suffixes[:, 4:] = previous[:, 1 : window - 2] + _CODON_GC_PREFIX[codons, 2:]
+
+        # the windows ending in each nucleotide of the codon
+        allowed = np.ones(len(codons), dtype=bool)
+        whole = np.arange(length - 2, length + 1) >= window
+        if whole.any():
+            counts = (
+                _CODON_GC_PREFIX[codons]
+                + previous[:, [window - 1, window - 2, window - 3]]
+            )[:, whole]
+            allowed &= ((lowest <= counts) & (counts <= highest)).all(axis=1)
+
+        # the windows ending further on, given the fewest and most G and C
+        # nucleotides the codons still to come could add
+        low, high = bounds
+        ahead = np.arange(max(1, window - length), min(window, len(low) - length))
+        if len(ahead):
+            chosen = suffixes[:, window - ahead]
+            fewest = low[length + ahead] - low[length]
+            most = high[length + ahead] - high[length]
+            allowed &= ((chosen >= lowest - most) & (chosen <= highest - fewest)).all(
+                axis=1
+            )
+        return allowed, suffixes
+
+    def __call__(self, protein):
+        if not isinstance(protein, str):
+            protein = bytes(_as_bytes(protein)).decode("ascii", "replace")
+        protein = protein.upper()
+
+        # without constraints, the best codon for each amino acid can be used
+        if not self.constrained:
+            return "".join(
+                _CODONS[options[np.argmax(self.log_weights[options])]]
+                for options in map(self._options, protein)
+            )
+
+        gc = self.gc_content is not None
+        if gc:
+            # a protein shorter than the window is checked as a whole, as one
+            # window, so that the search can still prune as it goes
+            window = min(self.gc_window, 3 * len(protein))
+            limits = self._gc_limits(window)
+            bounds = self._gc_bounds(protein)
+            suffixes = np.zeros((1, window + 1), dtype=np.int64)
+
+        scores = np.zeros(1)
+        keys = np.array([5**self.local - 1], dtype=np.uint64)
+        parent_path, codon_path = [], []
+        for position, amino_acid in enumerate(protein):
+            options = self._options(amino_acid)
+
+            # extend every partial sequence with every codon for the amino acid
+            parents = np.repeat(np.arange(len(keys)), len(options))
+            codons = np.broadcast_to(options, (len(keys), len(options))).ravel()
+            candidate_scores = scores[parents] + self.log_weights[codons]
+            candidate_keys = self._extend(keys[parents], codons)
+
+            allowed = self._clear(candidate_keys)
+            if gc:
+                gc_allowed, candidate_suffixes = self._gc_allowed(
+                    suffixes, parents, codons, position, bounds, limits
+                )
+                allowed &= gc_allowed
+            allowed = np.flatnonzero(allowed)
+
+            # drop candidates that no codon for the next amino acid can follow
+            if position + 1 < len(protein) and len(allowed) and len(self.sites):
+                following = self._options(protein[position + 1])
+                following_keys = self._extend(
+                    np.repeat(candidate_keys[allowed], len(following)),
+                    np.tile(following, len(allowed)),
+                )
+                allowed = allowed[
+                    self._clear(following_keys)
+                    .reshape(len(allowed), len(following))
+                    .any(axis=1)
+                ]
+            if not len(allowed):
+                raise ValueError(
+                    "No sequence satisfies the constraints at amino acid "
+                    + str(position + 1)
+                )
+
+            # the best candidate for each ending goes first, then the rest
+            order = allowed[np.argsort(-candidate_scores[allowed], kind="stable")]
+            _, first = np.unique(candidate_keys[order], return_index=True)
+            recent = np.zeros(len(order), dtype=bool)
+            recent[first] = True
+            best = np.concatenate([order[recent], order[~recent]])[: self.beam_width]
+
+            scores, keys = candidate_scores[best], candidate_keys[best]
+            if gc:
+                suffixes = candidate_suffixes[best]
+            parent_path.append(parents[best])
+            codon_path.append(codons[best])
+
+        chosen = int(np.argmax(scores))
+
+        # follow the chosen sequence back to the start
+        path = []
+        for parents, codons in zip(reversed(parent_path), reversed(codon_path)):
+            path.append(_CODONS[codons[chosen]])
+            chosen = parents[chosen]
+        return "".join(reversed(path))
+
+    def optimize_many(self, proteins):
+        return [self(protein) for protein in proteins]
+
+
+def _optimizer(weights, RSCUs, reference, genetic_code, **constraints):
+    weights = Weights(weights, RSCUs, reference, genetic_code)
+    return _Optimizer(weights, **constraints)
+
+
+def optimize(
+    protein,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    gc_content=None,
+    gc_window=50,
+    avoid=(),
+    max_homopolymer=None,
+    beam_width=32,
+):
+    r"""Designs a coding sequence for a protein with as high a CAI as possible.
+
+    Without constraints, each amino acid simply gets its codon with the highest
+    weight. With constraints, a beam search builds the sequence a codon at a
+    time, keeping the ``beam_width`` best partial sequences that satisfy them.
+
+    Args:
+        protein (str): The amino acid sequence, using * for stop codons.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        gc_content (tuple, optional): The lowest and highest GC content (as fractions) allowed in any window.
+        gc_window (int, optional): The length in nucleotides of the windows ``gc_content`` applies to. Defaults to 50.
+        avoid (list, optional): Sites, such as restriction sites, that mustn't appear on either strand.
+        max_homopolymer (int, optional): The longest run of a single nucleotide allowed.
+        beam_width (int, optional): The number of partial sequences kept. Larger values search more thoroughly. Defaults to 32.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`~CAI.Weights` object brings its own genetic code.
+
+    Returns:
+        str: The DNA sequence.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When the protein has an unknown amino acid, a constraint is
+            invalid or no sequence satisfying the constraints is found.
+    """
+    return _optimizer(
+        weights,
+        RSCUs,
+        reference,
+        genetic_code,
+        gc_content=gc_content,
+        gc_window=gc_window,
+        avoid=avoid,
+        max_homopolymer=max_homopolymer,
+        beam_width=beam_width,
+    )(protein)
+
+
+def optimize_many(
+    proteins,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    gc_content=None,
+    gc_window=50,
+    avoid=(),
+    max_homopolymer=None,
+    beam_width=32,
+    n_jobs=1,
+):
+    r"""Designs coding sequences for many proteins. See :func:`optimize` for details.
+
+    The weights and constraints are only worked out once for all the proteins.
+
+    Args:
+        proteins (iterable): The amino acid sequences.
+        n_jobs (int, optional): The number of processes to use. -1 uses one per CPU. Defaults to 1.
+
+    Returns:
+        list: The DNA sequence for each protein, in the order they were given.
+    """
+    optimizer = _optimizer(
+        weights,
+        RSCUs,
+        reference,
+        genetic_code,
+        gc_content=gc_content,
+        gc_window=gc_window,
+        avoid=avoid,
+        max_homopolymer=max_homopolymer,
+        beam_width=beam_width,
+    )
+    if n_jobs == 1:
+        return optimizer.optimize_many(proteins)
+
+    from ._parallel import map_chunks
+
+    return list(
+        chain.from_iterable(map_chunks(optimizer.optimize_many, proteins, n_jobs))
+    )
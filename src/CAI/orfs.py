@@ -0,0 +1,217 @@
+from collections import namedtuple
+import numpy as np
+from .CAI import (
+    Weights,
+    _INVALID,
+    _PerGeneticCode,
+    _as_bytes,
+    _codon_index,
+    _codon_tables,
+    _encode,
+    _genetic_code,
+    _segment_scores,
+    _unscorable_codon_error,
+)
+from .instrumentation import profiler
+
+ORF = namedtuple("ORF", ["contig", "strand", "frame", "start", "end", "codons", "CAI"])
+ORF.__doc__ = """An open reading frame found by :func:`scan_orfs`.
+
+Attributes:
+    contig (str): The ID of the contig the ORF is on.
+    strand (str): ``"+"`` for the forward strand or ``"-"`` for the reverse
+        strand.
+    frame (int): The reading frame (0, 1 or 2), counted from the start of the
+        strand.
+    start (int): Where the ORF starts on the forward strand, counting from zero.
+    end (int): Where the ORF ends on the forward strand (exclusive), including
+        its stop codon. On the reverse strand, the start codon is at the end.
+    codons (int): The number of codons in the ORF, not counting the stop codon.
+    CAI (float): The CAI of the ORF.
+"""
+
+# map each byte to the byte of its complement, reading U as T
+_COMPLEMENT = np.full(256, ord("N"), dtype=np.uint8)
+for _base, _complement in zip("ACGTU", "TGCAA"):
+    _COMPLEMENT[ord(_base)] = _COMPLEMENT[ord(_base.lower())] = ord(_complement)
+
+
+def _find_start_codons(genetic_code):
+    """Marks the start codons of a genetic code by codon index."""
+    start = np.zeros(_INVALID + 1, dtype=bool)
+    start[
+        [_codon_index(codon) for codon in _genetic_code(genetic_code).start_codons]
+    ] = True
+    return start
+
+
+_start_codons = _PerGeneticCode(_find_start_codons)
+
+
+def _reverse_complement(sequence):
+    """Returns the reverse complement of a byte array."""
+    return _COMPLEMENT[sequence][::-1]
+
+
+def _frame_orfs(weights, contig, sequence, start_codons, min_codons, missing):
+    """Finds and scores the ORFs of one reading frame of a strand.
+
+    Every stop codon ends the ORF that starts at the first start codon after the
+    previous stop codon, if there is one. The CAI of all of the ORFs is worked
+    out at once with :func:`~CAI.CAI._segment_scores`.
+
+    Args:
+        weights (Weights): The weights to score the ORFs with.
+        contig (str): The ID of the contig, to say which one is at fault in
+            errors.
+        sequence (numpy.ndarray): The frame's bytes, starting with its first codon.
+        start_codons (numpy.ndarray): Whether each codon index is a start codon.
+        min_codons (int): The fewest codons an ORF can have.
+        missing (numpy.ndarray): Whether each codon index is missing a weight.
+
+    Returns:
+        tuple: The index of the first codon and the stop codon of each ORF, and
+        the CAI of each ORF.
+    """
+    with profiler.stage("encoding", codons=len(sequence) // 3):
+        codons = _encode(sequence)
+
+    with profiler.stage("scoring", codons=len(codons)) as stage:
+        stops = np.flatnonzero(_codon_tables[weights.genetic_code]["stop"][codons])
+        starts = np.flatnonzero(start_codons[codons])
+
+        # the first start codon after the stop codon before each stop codon,
+        # if there is one before the stop codon itself
+        previous = np.concatenate(([-1], stops))[:-1]
+        first = np.searchsorted(starts, previous + 1)
+        found = first < len(starts)
+        first = np.append(starts, 0)[first]
+        found &= first < stops
+        starts, stops = first[found], stops[found]
+        keep = stops - starts >= min_codons
+        starts, stops = starts[keep], stops[keep]
+        stage.count(sequences=len(starts))
+
+        unscorable = missing[codons]
+        if unscorable.any():
+            bad = np.concatenate(([0], np.cumsum(unscorable)))
+            bad = np.flatnonzero(bad[stops] > bad[starts])
+            if len(bad):
+                start, stop = starts[bad[0]], stops[bad[0]]
+                raise _unscorable_codon_error(
+                    sequence[3 * start : 3 * stop],
+                    codons[start:stop],
+                    unscorable[start:stop],
+                    id=contig,
+                )
+
+        return starts, stops, _segment_scores(weights, codons, starts, stops)
+
+
+def scan_orfs(
+    contigs,
+    weights=None,
+    RSCUs=None,
+    reference=None,
+    genetic_code=11,
+    min_codons=100,
+    start_codons=None,
+    ambiguous="error",
+):
+    r"""Finds every open reading frame (ORF) in the six frames of contigs and scores its CAI.
+
+    Each strand of a contig is encoded once per reading frame. An ORF runs from
+    the first start codon after a stop codon (or the start of the frame) up to
+    and including the next stop codon, using the start and stop codons of the
+    genetic code. ORFs at the ends of a contig without a start or stop codon
+    are left out. The CAI of every ORF in a frame is worked out at once from
+    running sums of the log weights.
+
+    The ORFs of each contig are yielded as soon as it has been scanned, so
+    contigs can be streamed from a file of any size::
+
+        for orf in scan_orfs(read_fasta("contigs.fasta"), weights=weights):
+            print(orf.contig, orf.start, orf.end, orf.CAI)
+
+    Args:
+        contigs (iterable): ``(ID, sequence)`` pairs, like those from
+            :func:`~CAI.read_fasta`.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+        min_codons (int, optional): The fewest codons an ORF can have, not
+            counting the stop codon. Defaults to 100.
+        start_codons (iterable, optional): The codons ORFs can start with.
+            Defaults to the start codons of the genetic code.
+        ambiguous (str, optional): How to handle ambiguous codons in an ORF. They
+            never start or end one. See :func:`~CAI.CAI`.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`~CAI.Weights` object brings its own genetic code.
+
+    Yields:
+        ORF: Each ORF of each contig, in order of where they start on the forward
+        strand.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When ``min_codons`` is negative.
+        KeyError: When an ORF has a codon without a weight or a start codon isn't
+            a codon.
+    """
+    if min_codons < 0:
+        raise ValueError("The minimum number of codons can't be negative")
+    weights = Weights(weights, RSCUs, reference, genetic_code)
+    missing = weights._missing_for(ambiguous)
+    if start_codons is None:
+        start = _start_codons[weights.genetic_code]
+    else:
+        start = np.zeros(_INVALID + 1, dtype=bool)
+        for codon in start_codons:
+            i = _codon_index(codon)
+            if i is None:
+                raise KeyError(codon)
+            start[i] = True
+
+    # the arguments are checked straight away, before the first ORF is asked for
+    return _scan(contigs, weights, start, min_codons, missing)
+
+
+def _scan(contigs, weights, start_codons, min_codons, missing):
+    """Yields the ORFs of each contig. See :func:`scan_orfs`."""
+    for contig, sequence in contigs:
+        forward = _as_bytes(sequence)
+        length = len(forward)
+        orfs = []
+        for strand, strand_sequence in (
+            ("+", forward),
+            ("-", _reverse_complement(forward)),
+        ):
+            for frame in range(3):
+                starts, stops, scores = _frame_orfs(
+                    weights,
+                    contig,
+                    strand_sequence[frame:],
+                    start_codons,
+                    min_codons,
+                    missing,
+                )
+                # the positions of the ORFs on the strand, with the stop codon,
+                # which are flipped over for the reverse strand
+                begins = frame + 3 * starts
+                ends = frame + 3 * stops + 3
+                if strand == "-":
+                    begins, ends = length - ends, length - begins
+                orfs += [
+                    ORF(contig, strand, frame, *values)
+                    for values in zip(
+                        begins.tolist(),
+                        ends.tolist(),
+                        (stops - starts).tolist(),
+                        scores.tolist(),
+                    )
+                ]
+        orfs.sort(key=lambda orf: (orf.start, orf.end, orf.strand))
+        yield from orfs
@@ -0,0 +1,234 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import json
+import math
+from .CAI import Weights
+
+# the largest request body accepted, in bytes
+MAX_BODY = 64 * 1024 * 1024
+
+
+class _HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def _response(status, body, keep_alive):
+    """Formats an HTTP response with a JSON body."""
+    payload = json.dumps(body).encode()
+    head = (
+        "HTTP/1.1 {} {}\r\n"
+        "Content-Type: application/json\r\n"
+        "Content-Length: {}\r\n"
+        "Connection: {}\r\n\r\n"
+    ).format(
+        status.value,
+        status.phrase,
+        len(payload),
+        "keep-alive" if keep_alive else "close",
+    )
+    return head.encode("latin-1") + payload
+
+
+async def _read_request(reader, max_body):
+    """Reads one HTTP request.
+
+    Returns:
+        tuple: The method, the path, whether to keep the connection open and
+        the body of the request, or ``None`` once the client closes the
+        connection.
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise _HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise _HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > max_body:
+        raise _HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    body = await reader.readexactly(length) if length else b""
+
+    keep_alive = (
+        headers.get("connection", "").lower() != "close"
+        and version.upper() != "HTTP/1.0"
+    )
+    return method.upper(), path, keep_alive, body
+
+
+class ScoringServer:
+    r"""Serves CAI scores from weights that are loaded once and kept in memory.
+
+    Each scoring request is put on a bounded queue and scored by a pool of
+    worker threads. When the queue is full, requests are turned away with a
+    503 status straight away instead of piling up, so clients can back off.
+
+    The server speaks HTTP over either a TCP port or a Unix socket:
+
+    - ``GET /weights`` lists the names of the weights and their genetic codes.
+    - ``POST /score/<name>`` scores the sequences in a JSON body of the form
+      ``{"sequences": ["ATG...", ...]}`` with the named weights and replies
+      with ``{"CAI": [...]}``, using null for sequences without a CAI.
+
+    Args:
+        weights (dict): A :class:`~CAI.Weights` object (or a weights dictionary)
+            for each name.
+        queue_size (int, optional): The most requests waiting to be scored. Defaults to 64.
+        workers (int, optional): The number of threads scoring requests. Defaults to 1.
+        max_body (int, optional): The largest request body accepted, in bytes.
+
+    Raises:
+        ValueError: When there are no weights or ``queue_size`` or ``workers``
+            isn't positive.
+    """
+
+    def __init__(self, weights, queue_size=64, workers=1, max_body=MAX_BODY):
+        if not weights:
+            raise ValueError("At least one set of weights is needed")
+        if queue_size < 1 or workers < 1:
+            raise ValueError("The queue size and number of workers must be positive")
+        self.weights = {name: Weights(table) for name, table in weights.items()}
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_body = max_body
+        self._queue = None
+
+    async def _score(self, executor):
+        """Scores queued requests until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            weights, sequences, future = await self._queue.get()
+            try:
+                scores = await loop.run_in_executor(
+                    executor, weights.score_many, sequences
+                )
+            except (ValueError, KeyError) as e:
+                if not future.cancelled():
+                    future.set_exception(
+                        _HTTPError(HTTPStatus.BAD_REQUEST, str(e).strip("'\""))
+                    )
+            else:
+                if not future.cancelled():
+                    future.set_result(
+                        [
+                            None if math.isnan(score) else score
+                            for score in scores.tolist()
+                        ]
+                    )
+            finally:
+                self._queue.task_done()
+
+    async def _handle(self, method, path, body):
+        """Works out the response body to a request."""
+        if path == "/weights":
+            if method != "GET":
+                raise _HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            return {
+                name: {"genetic_code": weights.genetic_code}
+                for name, weights in self.weights.items()
+            }
+
+        if not path.startswith("/score/"):
+            raise _HTTPError(HTTPStatus.NOT_FOUND)
+        if method != "POST":
+            raise _HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        name = path[len("/score/") :]
+        if name not in self.weights:
+            raise _HTTPError(HTTPStatus.NOT_FOUND, "No weights named " + name)
+
+        try:
+            sequences = json.loads(body)["sequences"]
+        except (ValueError, KeyError, TypeError):
+            raise _HTTPError(
+                HTTPStatus.BAD_REQUEST, 'Expected a body of {"sequences": [...]}'
+            )
+        if not isinstance(sequences, list) or not all(
+            isinstance(sequence, str) for sequence in sequences
+        ):
+            raise _HTTPError(HTTPStatus.BAD_REQUEST, "The sequences must be strings")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((self.weights[name], sequences, future))
+        except asyncio.QueueFull:
+            raise _HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "The queue is full")
+        return {"CAI": await future}
+
+    async def _connection(self, reader, writer):
+        """Answers the requests of one connection until it is closed."""
+        try:
+            while True:
+                # a request that can't be read leaves the connection in an
+                # unknown state, so it is closed after the error is sent
+                keep_alive = False
+                try:
+                    request = await _read_request(reader, self.max_body)
+                    if request is None:
+                        break
+                    method, path, keep_alive, body = request
+                    status = HTTPStatus.OK
+                    response = await self._handle(method, path, body)
+                except _HTTPError as e:
+                    status, response = e.status, {"error": str(e)}
+                writer.write(_response(status, response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000, path=None, ready=None):
+        """Serves requests until cancelled.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to 127.0.0.1, so
+                only this machine can connect.
+            port (int, optional): The TCP port to listen on. Defaults to 8000.
+            path (str, optional): Listen on a Unix socket at this path instead of a
+                TCP port.
+            ready (callable, optional): Called with the listening
+                :class:`asyncio.AbstractServer` once it has started.
+        """
+        self._queue = asyncio.Queue(self.queue_size)
+        with ThreadPoolExecutor(self.workers) as executor:
+            scorers = [
+                asyncio.ensure_future(self._score(executor))
+                for _ in range(self.workers)
+            ]
+            if path is not None:
+                server = await asyncio.start_unix_server(self._connection, path)
+            else:
+                server = await asyncio.start_server(self._connection, host, port)
+            if ready is not None:
+                ready(server)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                for scorer in scorers:
+                    scorer.cancel()
+                await asyncio.gather(*scorers, return_exceptions=True)
+
+    def run(self, host="127.0.0.1", port=8000, path=None, ready=None):
+        """Runs :meth:`serve` in a new event loop until interrupted."""
+        try:
+            asyncio.run(self.serve(host, port, path, ready))
+        except KeyboardInterrupt:
+            pass
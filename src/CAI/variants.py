@@ -0,0 +1,162 @@
+import numpy as np
+from .CAI import (
+    Weights,
+    _CODONS,
+    _INVALID,
+    _codon_index,
+    _codon_tables,
+    _missing_weight_error,
+)
+
+
+class IncrementalCAI:
+    r"""Tracks the CAI of a gene as its codons are substituted.
+
+    The sum of the log weights of the gene's codons and the number of codons
+    counted are kept, so the CAI after changing one codon takes constant time
+    to work out rather than rescoring the whole gene. :meth:`synonymous_scan`
+    works out the CAI of every synonymous single-codon variant at once.
+
+    Args:
+        sequence (str): The DNA sequence of the gene.
+        weights (dict or Weights, optional): The relative adaptiveness of the codons in the reference set.
+        RSCUs (dict, optional): The RSCU of the reference set.
+        reference (list): The reference set of sequences.
+        genetic_code (int, optional): The translation table to use. Defaults to 11, the standard genetic code.
+
+    Note:
+        One of ``weights``, ``reference`` or ``RSCUs`` is required. A
+        :class:`~CAI.Weights` object brings its own genetic code.
+
+    Raises:
+        TypeError: When anything other than one of either reference sequences, or RSCU dictionary, or weights is provided.
+        ValueError: When the sequence is empty or not divisible by three.
+        KeyError: When there is a missing weight for a codon.
+    """
+
+    #: The codon of each column of :meth:`synonymous_scan`.
+    codons = _CODONS
+
+    def __init__(
+        self, sequence, weights=None, RSCUs=None, reference=None, genetic_code=11
+    ):
+        weights = Weights(weights, RSCUs, reference, genetic_code)
+        self._weights = weights
+        self._codons = weights._encode(sequence).copy()
+
+        # log weights of zero are tallied separately so the total stays finite
+        log_weights = weights._log_weights
+        self._zero = np.isneginf(log_weights)
+        self._log_weights = np.where(self._zero, 0, log_weights)
+        self._counted = weights._counted.astype(np.intp)
+
+        self._total = float(self._log_weights[self._codons].sum())
+        self._length = int(self._counted[self._codons].sum())
+        self._zeros = int(self._zero[self._codons].sum())
+
+    def __len__(self):
+        return len(self._codons)
+
+    @property
+    def sequence(self):
+        """str: The gene with all substitutions applied so far."""
+        return "".join(_CODONS[i] if i < _INVALID else "NNN" for i in self._codons)
+
+    @property
+    def cai(self):
+        """float: The CAI of the gene with all substitutions applied so far."""
+        return self._cai(self._total, self._length, self._zeros)
+
+    @staticmethod
+    def _cai(total, length, zeros):
+        if not length:
+            return float("nan")
+        return 0.0 if zeros else float(np.exp(total / length))
+
+    def _change(self, position, codon):
+        """Returns how the running totals change if a codon is substituted."""
+        new = _codon_index(codon)
+        if new is None:
+            raise ValueError("Not a codon: {!r}".format(codon))
+        if self._weights._missing[new]:
+            raise _missing_weight_error(_CODONS[new])
+        old = self._codons[position]
+        return (
+            new,
+            self._log_weights[new] - self._log_weights[old],
+            self._counted[new] - self._counted[old],
+            int(self._zero[new]) - int(self._zero[old]),
+        )
+
+    def substitute(self, position, codon):
+        """Calculates the CAI the gene would have with one codon substituted.
+
+        The gene itself is left unchanged.
+
+        Args:
+            position (int): The position of the codon to replace, counting codons from zero.
+            codon (str): The codon to put in its place.
+
+        Returns:
+            float: The CAI after the substitution.
+
+        Raises:
+            ValueError: When ``codon`` isn't a codon.
+            KeyError: When there is a missing weight for ``codon``.
+        """
+        _, total, length, zeros = self._change(position, codon)
+        return self._cai(
+            self._total + total, self._length + length, self._zeros + zeros
+        )
+
+    def apply(self, position, codon):
+        """Substitutes one codon of the gene, updating its CAI.
+
+        Args:
+            position (int): The position of the codon to replace, counting codons from zero.
+            codon (str): The codon to put in its place.
+
+        Returns:
+            float: The new CAI of the gene.
+
+        Raises:
+            ValueError: When ``codon`` isn't a codon.
+            KeyError: When there is a missing weight for ``codon``.
+        """
+        new, total, length, zeros = self._change(position, codon)
+        self._codons[position] = new
+        self._total += total
+        self._length += length
+        self._zeros += zeros
+        return self.cai
+
+    def synonymous_scan(self):
+        """Calculates the CAI of every synonymous single-codon variant of the gene.
+
+        Returns:
+            numpy.ndarray: A matrix with a row for each codon of the gene and a
+            column for each of the 64 codons (see :attr:`codons`). Each entry is
+            the CAI of the gene with that codon substituted at that position, or
+            nan if the codon isn't synonymous with the one already there. Stop
+            codons and codons that aren't A, C, G or T have no synonymous
+            variants.
+        """
+        table = _codon_tables[self._weights.genetic_code]
+        amino_acid = table["amino_acid"][:_INVALID]
+        sense = table["sense"][:_INVALID] & ~self._weights._missing[:_INVALID]
+
+        # swap the contribution of the current codon for that of each other one
+        codons = self._codons[:, None]
+        totals = self._total - self._log_weights[codons] + self._log_weights[:_INVALID]
+        lengths = self._length - self._counted[codons] + self._counted[:_INVALID]
+        zeros = self._zeros - self._zero[codons] + self._zero[:_INVALID]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scan = np.exp(totals / lengths)
+        scan[zeros > 0] = 0
+        scan[lengths == 0] = np.nan
+
+        synonymous = (table["amino_acid"][codons] == amino_acid) & sense
+        synonymous &= table["sense"][codons]
+        scan[~synonymous] = np.nan
+        return scan
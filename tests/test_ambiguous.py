@@ -0,0 +1,113 @@
+from CAI import (
+    CAI,
+    CAI_batch,
+    CAI_profile,
+    RSCU,
+    CodonCountMatrix,
+    Weights,
+    codon_indices,
+    relative_adaptiveness,
+)
+from CAI.cli import cli
+from click.testing import CliRunner
+import math
+import numpy as np
+import pytest
+
+WEIGHTS = relative_adaptiveness(sequences=["AACCTGTTCAAGAAT"])
+
+
+def test_error():
+    for ambiguous in ("error", None, "ignore"):
+        with pytest.raises((KeyError, ValueError)):
+            CAI("AACNNN", weights=WEIGHTS, ambiguous=ambiguous)
+    with pytest.raises(KeyError, match="Ambiguous codon NRN"):
+        CAI("AACNRN", weights=WEIGHTS)
+    with pytest.raises(KeyError, match="Ambiguous codon"):
+        CAI_batch(["AAC", "AACNNN"], weights=WEIGHTS)
+
+    # codons without a weight are still an error, whatever the policy
+    with pytest.raises(KeyError, match="missing weight for codon GGG"):
+        CAI("NNNGGG", weights={"AAC": 1, "AAT": 0.5}, ambiguous="skip")
+
+
+def test_masking():
+    for ambiguous in ("skip", "count-as-invalid"):
+        assert CAI("AATNNNAACYYY", weights=WEIGHTS, ambiguous=ambiguous) == CAI(
+            "AATAAC", weights=WEIGHTS
+        )
+        assert math.isnan(CAI("NNN", weights=WEIGHTS, ambiguous=ambiguous))
+
+
+def test_masked_counts():
+    sequences = ["AATNNNAACYYY", "AAC", "NNNNNN", "AATaurNNNaau"]
+    for n_jobs in (1, 2):
+        scores, masked = CAI_batch(
+            sequences,
+            weights=WEIGHTS,
+            ambiguous="skip",
+            return_masked=True,
+            n_jobs=n_jobs,
+        )
+        assert list(masked) == [2, 0, 2, 2]
+        for sequence, score in zip(sequences, scores):
+            assert np.isclose(
+                score, CAI(sequence, weights=WEIGHTS, ambiguous="skip"), equal_nan=True
+            )
+    scores, masked = CAI_batch([], weights=WEIGHTS, return_masked=True)
+    assert len(scores) == len(masked) == 0
+
+
+def test_profile():
+    weights = Weights(WEIGHTS)
+    sequence = "AATNNNAACAAC"
+    skipped = weights.profile(sequence, window=2, ambiguous="skip")
+    invalid = weights.profile(sequence, window=2, ambiguous="count-as-invalid")
+    assert np.allclose(skipped, [weights.score("AATAAC"), 1])
+    assert np.allclose(invalid, [weights.score("AAT"), 1, 1])
+    assert np.allclose(
+        CAI_profile(sequence, weights=WEIGHTS, window=2, ambiguous="skip"), skipped
+    )
+
+
+def test_rscu():
+    assert RSCU(["AACNNN"]) == RSCU(["AACNNN"], ambiguous="skip") == RSCU(["AAC"])
+    with pytest.raises(ValueError, match="Ambiguous codon NNN"):
+        RSCU(["AAC", "AACNNN"], ambiguous="error")
+    with pytest.raises(ValueError):
+        RSCU(["AAC"], ambiguous="ignore")
+
+    # RNA reference sequences count the same as DNA
+    assert RSCU(["AACUUG"]) == RSCU(["AACTTG"])
+
+
+def test_counts():
+    sequences = ["AATNNNAAC", "AAC"]
+    matrix = CodonCountMatrix.from_sequences(sequences)
+    with pytest.raises(KeyError):
+        matrix.CAI(WEIGHTS)
+    expected = CAI_batch(sequences, weights=WEIGHTS, ambiguous="skip")
+    assert np.allclose(matrix.CAI(WEIGHTS, ambiguous="skip"), expected)
+    assert np.allclose(
+        codon_indices(sequences, WEIGHTS, ambiguous="count-as-invalid").CAI, expected
+    )
+    with pytest.raises(KeyError):
+        codon_indices(sequences, WEIGHTS)
+
+
+def test_cli(tmp_path):
+    sequences = tmp_path / "sequences.fasta"
+    sequences.write_text(">one\nAATNNNAAC\n>two\nAAC\n")
+    reference = tmp_path / "reference.fasta"
+    reference.write_text(">reference\nAACCTGTTCAAGAAT\n")
+
+    result = CliRunner().invoke(cli, ["-s", str(sequences), "-r", str(reference)])
+    assert result.exit_code != 0
+    result = CliRunner().invoke(
+        cli, ["-s", str(sequences), "-r", str(reference), "--ambiguous", "skip"]
+    )
+    assert result.exit_code == 0
+    lines = result.output.splitlines()[1:]
+    assert [float(line.split("\t")[-1]) for line in lines] == list(
+        CAI_batch(["AATAAC", "AAC"], weights=WEIGHTS)
+    )
@@ -0,0 +1,72 @@
+from CAI import CAI, RSCU, ReferenceCache, reference_cache, relative_adaptiveness
+import pytest
+
+
+@pytest.fixture
+def cache():
+    reference_cache.enable(maxsize=2)
+    reference_cache.clear()
+    yield reference_cache
+    reference_cache.disable()
+    reference_cache.clear()
+
+
+def test_disabled_by_default():
+    assert not ReferenceCache().enabled
+    RSCU(["AAC"])
+    assert reference_cache.info().currsize == 0
+
+
+def test_bad_size():
+    with pytest.raises(ValueError):
+        ReferenceCache().enable(maxsize=0)
+
+
+def test_hits_and_misses(cache):
+    assert RSCU(["AAC"]) == RSCU(["AAC"])
+    assert cache.info() == (1, 1, 2, 1)
+
+    # a different genetic code or reference is a different entry
+    RSCU(["AAC"], genetic_code=10)
+    RSCU(["AAT"])
+    assert cache.info() == (1, 3, 2, 2)
+
+
+def test_transparent(cache):
+    CAI("AAT", reference=["AAC"])
+    relative_adaptiveness(sequences=["AAC"])
+    assert CAI("AAT", reference=["AAC"]) == 0.5
+    assert cache.info().hits == 2
+
+
+def test_returns_copies(cache):
+    RSCU(["AAC"])["AAC"] = 0
+    assert RSCU(["AAC"])["AAC"] != 0
+
+
+def test_lru_eviction(cache):
+    RSCU(["AAC"])
+    RSCU(["AAT"])
+    RSCU(["AAC"])  # AAT is now the least recently used
+    RSCU(["AAA"])
+    misses = cache.info().misses
+    RSCU(["AAC"])
+    assert cache.info().misses == misses
+    RSCU(["AAT"])
+    assert cache.info().misses == misses + 1
+
+
+def test_clear(cache):
+    RSCU(["AAC"])
+    RSCU(["AAC"])
+    cache.clear()
+    assert cache.info() == (0, 0, 2, 0)
+
+
+def test_sequence_boundaries(cache):
+    # the same bytes split into different sequences aren't the same reference set
+    RSCU(["AAATTT"])
+    with pytest.raises(ValueError, match="not divisible by three"):
+        RSCU(["AAAT", "TT"])
+    assert cache.info().hits == 0
+    assert RSCU(["AAA", "TTT"]) == RSCU(["AAATTT"])
@@ -0,0 +1,77 @@
+from CAI import CAI, CAI_batch, RSCU, relative_adaptiveness
+import pytest
+import math
+
+
+def test_bad_args():
+    with pytest.raises(TypeError):
+        CAI_batch(["AAC"])  # no reference data
+    with pytest.raises(ValueError):
+        CAI_batch(["AAC", ""], reference=["AAC"])
+    with pytest.raises(ValueError):
+        CAI_batch(["AAC", "AA"], reference=["AAC"])
+    with pytest.raises(KeyError):
+        CAI_batch(["AACNNN"], reference=["AAC"])
+
+
+def test_matches_cai():
+    sequences = ["AAC", "AAT", "AATAAC", "AATTAA", "CTGCTATTTAAAGGG" * 7]
+    weights = relative_adaptiveness(sequences=["AACCTGTTCAAG"])
+    result = CAI_batch(sequences, weights=weights)
+    assert result.dtype == float
+    assert len(result) == len(sequences)
+    for sequence, cai in zip(sequences, result):
+        assert math.isclose(cai, CAI(sequence, weights=weights))
+
+
+def test_arg_equivalence():
+    sequences = ["AAT", "AACAAT"]
+    assert (
+        list(CAI_batch(sequences, reference=["AAC"]))
+        == list(CAI_batch(sequences, RSCUs=RSCU(["AAC"])))
+        == list(CAI_batch(sequences, weights=relative_adaptiveness(["AAC"])))
+    )
+
+
+def test_iterator():
+    assert list(CAI_batch(iter(["AAT", "AAC"]), reference=["AAC"])) == [0.5, 1.0]
+    assert len(CAI_batch([], reference=["AAC"])) == 0
+
+
+def test_only_non_synonymous():
+    result = CAI_batch(["ATG", "AAT", "ATGTGG"], reference=["AAC"])
+    assert math.isnan(result[0])
+    assert result[1] == 0.5
+    assert math.isnan(result[2])
+
+
+def test_alternate_genetic_code():
+    assert list(CAI_batch(["AATTGA"], reference=["AAC"])) != list(
+        CAI_batch(["AATTGA"], reference=["AAC"], genetic_code=10)
+    )
+
+
+def test_error_locations():
+    from CAI import Weights, codon_indices
+
+    weights = Weights(reference=["AACCTGTTCAAG"])
+    for n_jobs in (1, 2):
+        sequences = ["AAC"] * 1200
+        sequences[650] = "AACG"
+        with pytest.raises(ValueError, match="^Sequence 650: "):
+            weights.score_many(sequences, n_jobs=n_jobs)
+        with pytest.raises(ValueError, match="^Sequence 650: "):
+            codon_indices(sequences, weights, n_jobs=n_jobs)
+
+        sequences[650] = "AACNNN"
+        with pytest.raises(KeyError, match="Sequence 650 .x.: Ambiguous codon NNN"):
+            weights.score_many(sequences, n_jobs=n_jobs, ids=["x"] * len(sequences))
+        with pytest.raises(KeyError, match="Sequence 650: Ambiguous codon NNN"):
+            codon_indices(sequences, weights, n_jobs=n_jobs)
+
+        with pytest.raises(ValueError, match="one ID for each sequence"):
+            weights.score_many(sequences, n_jobs=n_jobs, ids=["x"])
+
+        sequences[650] = "GGG"
+        with pytest.raises(KeyError, match="Sequence 650: .*missing weight"):
+            CAI_batch(sequences, weights={"AAC": 1}, n_jobs=n_jobs)
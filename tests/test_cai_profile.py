@@ -0,0 +1,44 @@
+from CAI import CAI, CAI_profile, Weights
+import pytest
+import math
+
+REFERENCE = ["AACCTGTTCAAGGGTTAA"]
+SEQUENCE = "ATGAATCTATTTAAAGGGTAAAACTGGCTG" * 5
+
+
+def test_matches_cai():
+    for window, step in [(1, 1), (4, 3), (10, 1), (50, 50)]:
+        profile = CAI_profile(SEQUENCE, reference=REFERENCE, window=window, step=step)
+        starts = range(0, len(SEQUENCE) // 3 - window + 1, step)
+        assert len(profile) == len(starts)
+        for start, cai in zip(starts, profile):
+            expected = CAI(
+                SEQUENCE[3 * start : 3 * (start + window)], reference=REFERENCE
+            )
+            assert cai == pytest.approx(expected, nan_ok=True)
+
+
+def test_exclusions():
+    # windows with only stop codons and codons without synonyms are nan
+    profile = CAI_profile("AATATGTGGTAAAAC", reference=["AAC"], window=2)
+    assert profile[0] == pytest.approx(0.5)
+    assert math.isnan(profile[1]) and math.isnan(profile[2])
+    assert profile[3] == 1.0
+
+
+def test_zero_weights():
+    weights = Weights({"AAC": 1.0, "AAT": 0.0})
+    assert list(weights.profile("AATAACAACAAC", window=2)) == [0.0, 1.0, 1.0]
+
+
+def test_short_sequence():
+    assert len(CAI_profile("AAC", reference=["AAC"], window=2)) == 0
+
+
+def test_bad_args():
+    with pytest.raises(ValueError):
+        CAI_profile(SEQUENCE, reference=REFERENCE, window=0)
+    with pytest.raises(ValueError):
+        CAI_profile(SEQUENCE, reference=REFERENCE, step=0)
+    with pytest.raises(TypeError):
+        CAI_profile(SEQUENCE)
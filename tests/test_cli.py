@@ -0,0 +1,170 @@
+from CAI.cli import cli
+from click.testing import CliRunner
+import os
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "example_seqs")
+GFP = os.path.join(EXAMPLES, "gfp.fasta")
+ECOLI = os.path.join(EXAMPLES, "ecol.heg.fasta")
+
+
+def test_cli():
+    result = CliRunner().invoke(cli, ["-s", GFP, "-r", ECOLI])
+    assert result.exit_code == 0
+    assert float(result.output) == 0.3753543123685772
+
+
+def test_single_record_table(tmp_path):
+    # only the top-level command without --output prints a bare CAI
+    result = CliRunner().invoke(cli, ["score", "-s", GFP, "-r", ECOLI])
+    assert result.exit_code == 0
+    header, row = result.output.splitlines()
+    assert header == "id\tlength\tcodons\tCAI"
+    assert float(row.split("\t")[3]) == 0.3753543123685772
+
+    output = tmp_path / "cai.tsv"
+    result = CliRunner().invoke(cli, ["-s", GFP, "-r", ECOLI, "-o", str(output)])
+    assert result.exit_code == 0
+    assert output.read_text().splitlines() == [header, row]
+
+
+def test_jobs():
+    serial = CliRunner().invoke(cli, ["-s", GFP, "-r", ECOLI])
+    parallel = CliRunner().invoke(cli, ["-s", GFP, "-r", ECOLI, "--jobs", "2"])
+    assert parallel.exit_code == 0
+    assert parallel.output == serial.output
+
+
+def test_multiple_records(tmp_path):
+    from Bio import SeqIO
+    from CAI import CAI_batch
+
+    result = CliRunner().invoke(cli, ["-s", ECOLI, "-r", ECOLI])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0] == "id\tlength\tcodons\tCAI"
+
+    records = list(SeqIO.parse(ECOLI, "fasta"))
+    sequences = [str(record.seq) for record in records]
+    expected = CAI_batch(sequences, reference=sequences)
+    assert len(lines) == len(records) + 1
+    for line, record, cai in zip(lines[1:], records, expected):
+        name, length, codons, score = line.split("\t")
+        assert name == record.id
+        assert int(length) == len(record) == 3 * int(codons)
+        assert float(score) == cai
+
+    # the table can also be written to a file
+    output = tmp_path / "cai.tsv"
+    result = CliRunner().invoke(cli, ["-s", ECOLI, "-r", ECOLI, "-o", str(output)])
+    assert result.exit_code == 0
+    assert output.read_text().splitlines() == lines
+
+
+def test_index(tmp_path):
+    index = str(tmp_path / "ecol.json")
+    result = CliRunner().invoke(cli, ["build-index", "-r", ECOLI, "-o", index])
+    assert result.exit_code == 0
+
+    expected = CliRunner().invoke(cli, ["-s", ECOLI, "-r", ECOLI]).output
+    assert CliRunner().invoke(cli, ["score", "-s", ECOLI, "-i", index]).output == (
+        expected
+    )
+    assert CliRunner().invoke(cli, ["-s", ECOLI, "-i", index]).output == expected
+
+    # the genetic code comes from the index
+    result = CliRunner().invoke(cli, ["-s", GFP, "-i", index, "-g", "4"])
+    assert result.exit_code != 0
+
+
+def test_invalid_reference(tmp_path):
+    reference = tmp_path / "reference.fasta"
+    reference.write_text(">good\nAACAAG\n>bad\nAACA\n")
+    index = str(tmp_path / "index.json")
+
+    result = CliRunner().invoke(cli, ["build-index", "-r", str(reference), "-o", index])
+    assert result.exit_code != 0
+    assert "Sequence 1 (bad): Input sequence not divisible by three" in result.output
+
+    result = CliRunner().invoke(
+        cli, ["build-index", "-r", str(reference), "-o", index, "--skip-invalid"]
+    )
+    assert result.exit_code == 0
+    assert "Skipped 1 invalid sequence" in result.output
+
+
+def test_missing_arguments():
+    assert CliRunner().invoke(cli, ["-s", GFP]).exit_code != 0
+    assert CliRunner().invoke(cli, ["-r", ECOLI]).exit_code != 0
+    assert CliRunner().invoke(cli, ["-s", GFP, "-r", ECOLI, "-i", GFP]).exit_code != 0
+
+
+def test_profile():
+    from CAI import CAI_profile
+    from CAI.fasta import read_fasta
+
+    result = CliRunner().invoke(
+        cli, ["profile", "-s", GFP, "-r", ECOLI, "-w", "10", "--step", "5"]
+    )
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0] == "id\tstart\tend\tCAI"
+
+    ((_, sequence),) = read_fasta(GFP)
+    reference = [sequence for _, sequence in read_fasta(ECOLI)]
+    expected = CAI_profile(sequence, reference=reference, window=10, step=5)
+    assert len(lines) == len(expected) + 1
+    assert lines[2].split("\t")[1:3] == ["16", "45"]
+    assert [float(line.split("\t")[3]) for line in lines[1:]] == list(expected)
+
+
+def test_profile_errors(tmp_path):
+    sequence = tmp_path / "sequence.fasta"
+    sequence.write_text(">s1\nAATNNNAAC\n")
+    reference = tmp_path / "reference.fasta"
+    reference.write_text(">reference\nAACCTGTTCAAGAAT\n")
+
+    result = CliRunner().invoke(
+        cli, ["profile", "-s", str(sequence), "-r", str(reference), "-w", "2"]
+    )
+    assert result.exit_code == 1
+    assert "Error: s1: Ambiguous codon NNN" in result.output
+
+
+def test_profile_skipped_codons(tmp_path):
+    sequence = tmp_path / "sequence.fasta"
+    sequence.write_text(">one\nAATNNNAACAACNNNAAT\n")
+    reference = tmp_path / "reference.fasta"
+    reference.write_text(">reference\nAACCTGTTCAAGAAT\n")
+
+    result = CliRunner().invoke(
+        cli,
+        ["profile", "-s", str(sequence), "-r", str(reference), "-w", "2"]
+        + ["--ambiguous", "skip"],
+    )
+    assert result.exit_code == 0
+    # the windows span the skipped codons
+    bounds = [line.split("\t")[1:3] for line in result.output.splitlines()[1:]]
+    assert bounds == [["1", "9"], ["7", "12"], ["10", "18"]]
+
+
+def test_invalid_sequences(tmp_path):
+    reference = tmp_path / "reference.fasta"
+    reference.write_text(">reference\nAACCTGTTCAAGAAT\n")
+    sequences = tmp_path / "sequences.fasta"
+    records = [">s{}\nAAC\n".format(i) for i in range(1200)]
+    records[650] = ">bad\nAACNNN\n"
+    sequences.write_text("".join(records))
+    single = tmp_path / "single.fasta"
+    single.write_text(">only\nAACG\n")
+
+    for jobs in ("1", "2"):
+        result = CliRunner().invoke(
+            cli, ["-s", str(sequences), "-r", str(reference), "-j", jobs]
+        )
+        assert result.exit_code == 1
+        assert "Sequence 650 (bad): Ambiguous codon NNN" in result.output
+        assert "Traceback" not in result.output
+
+    result = CliRunner().invoke(cli, ["-s", str(single), "-r", str(reference)])
+    assert result.exit_code == 1
+    assert "Sequence 0 (only): Input sequence not divisible by three" in result.output
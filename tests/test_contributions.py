@@ -0,0 +1,61 @@
+from CAI import (
+    CAI,
+    CAI_batch,
+    CAIContributions,
+    CAI_contributions,
+    CodonCountMatrix,
+    relative_adaptiveness,
+)
+import numpy as np
+import pytest
+
+SEQUENCES = ["AATAACCTGCTATTTAAAGGG", "AACAAC", "ATGTGG", "CTGCTATTTNNNAAGGGC"]
+WEIGHTS = relative_adaptiveness(sequences=["AACCTGTTCAAGAATGGCGGT"])
+
+
+def test_sums_to_log_cai():
+    contributions = CAI_contributions(SEQUENCES, WEIGHTS, ambiguous="skip")
+    assert isinstance(contributions, CAIContributions)
+    assert contributions.by_codon.shape == (len(SEQUENCES), 64)
+    assert contributions.by_amino_acid.shape == (len(SEQUENCES), 20)
+    assert len(contributions.codons) == 64
+    assert contributions.amino_acids[:3] == ("A", "C", "D")
+
+    expected = np.log(CAI_batch(SEQUENCES, weights=WEIGHTS, ambiguous="skip"))
+    assert np.allclose(contributions.by_codon.sum(axis=1), expected, equal_nan=True)
+    assert np.allclose(
+        contributions.by_amino_acid.sum(axis=1), expected, equal_nan=True
+    )
+    assert (contributions.by_codon[:2] <= 0).all()
+
+    # a gene with only codons without synonyms has no CAI to split up
+    assert np.isnan(contributions.by_codon[2]).all()
+
+
+def test_values():
+    contributions = CAI_contributions(["AATAACAAC"], WEIGHTS)
+    by_codon = dict(zip(contributions.codons, contributions.by_codon[0]))
+    assert by_codon["AAT"] == pytest.approx(np.log(WEIGHTS["AAT"]) / 3)
+    assert by_codon["AAC"] == pytest.approx(2 * np.log(WEIGHTS["AAC"]) / 3)
+    by_amino_acid = dict(zip(contributions.amino_acids, contributions.by_amino_acid[0]))
+    assert by_amino_acid["N"] == pytest.approx(np.log(CAI("AATAACAAC", WEIGHTS)))
+    assert by_amino_acid["K"] == 0
+
+
+def test_zero_weight():
+    weights = dict(WEIGHTS, AAT=0)
+    contributions = CAI_contributions(["AATAAC", "AAC"], weights)
+    by_codon = dict(zip(contributions.codons, contributions.by_codon.T))
+    assert list(by_codon["AAT"]) == [-np.inf, 0]
+    by_amino_acid = dict(zip(contributions.amino_acids, contributions.by_amino_acid.T))
+    assert list(by_amino_acid["N"]) == [-np.inf, 0]
+    assert list(by_amino_acid["K"]) == [0, 0]
+
+
+def test_count_matrix():
+    matrix = CodonCountMatrix.from_sequences(SEQUENCES[:3])
+    contributions = matrix.contributions(WEIGHTS)
+    expected = CAI_contributions(SEQUENCES[:3], WEIGHTS, n_jobs=2)
+    assert np.allclose(contributions.by_codon, expected.by_codon, equal_nan=True)
+    with pytest.raises(KeyError):
+        CAI_contributions(SEQUENCES, WEIGHTS)
@@ -0,0 +1,154 @@
+from CAI import (
+    RSCU,
+    CAI_batch,
+    CodonCountMatrix,
+    Weights,
+    codon_indices,
+    read_fasta,
+    relative_adaptiveness,
+)
+import numpy as np
+import os
+import pytest
+
+ECOLI = os.path.join(
+    os.path.dirname(__file__), os.pardir, "example_seqs", "ecol.heg.fasta"
+)
+RECORDS = list(read_fasta(ECOLI))
+IDS = [name for name, _ in RECORDS]
+SEQUENCES = [sequence for _, sequence in RECORDS]
+MATRIX = CodonCountMatrix.from_fasta(ECOLI)
+
+
+def test_counts():
+    assert len(MATRIX) == len(RECORDS)
+    assert list(MATRIX.ids) == IDS
+    assert MATRIX.counts.shape == (len(RECORDS), 64)
+    for row, sequence in zip(MATRIX.counts[:10], SEQUENCES):
+        codons = bytes(sequence).decode()
+        for codon, count in zip(MATRIX.codons, row):
+            assert count == sum(
+                codons[i : i + 3] == codon for i in range(0, len(codons), 3)
+            )
+    assert MATRIX.invalid.sum() == 0
+    assert CodonCountMatrix.from_sequences(["AANAAA"]).invalid[0] == 1
+
+
+def test_reference_calculations():
+    assert MATRIX.RSCU() == pytest.approx(RSCU(SEQUENCES))
+    assert MATRIX.relative_adaptiveness() == pytest.approx(
+        relative_adaptiveness(SEQUENCES)
+    )
+    assert MATRIX.weights().to_dict() == pytest.approx(
+        Weights(reference=SEQUENCES).to_dict()
+    )
+    assert list(MATRIX.CAI(reference=SEQUENCES)) == pytest.approx(
+        list(CAI_batch(SEQUENCES, reference=SEQUENCES))
+    )
+    for a, b in zip(
+        MATRIX.indices(weights=MATRIX.weights()),
+        codon_indices(SEQUENCES, reference=SEQUENCES),
+    ):
+        assert list(a) == pytest.approx(list(b), nan_ok=True)
+
+
+def test_subsets():
+    subset = MATRIX[10:50]
+    assert list(subset.ids) == IDS[10:50]
+    assert subset.RSCU() == pytest.approx(RSCU(SEQUENCES[10:50]))
+    assert np.shares_memory(subset.counts, MATRIX.counts)
+
+    by_id = MATRIX[[IDS[3], IDS[1]]]
+    assert list(by_id.ids) == [IDS[3], IDS[1]]
+    assert (by_id.counts == MATRIX.counts[[3, 1]]).all()
+    mask = np.arange(len(MATRIX)) % 2 == 0
+    assert (MATRIX[mask].counts == MATRIX.counts[mask]).all()
+    assert list(MATRIX[5].ids) == [IDS[5]]
+    with pytest.raises(KeyError):
+        MATRIX[["not a gene"]]
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / "counts.npz")
+    MATRIX.save(path)
+    for mmap_mode in (None, "r"):
+        loaded = CodonCountMatrix.load(path, mmap_mode=mmap_mode)
+        assert (loaded.counts == MATRIX.counts).all()
+        assert list(loaded.ids) == IDS
+        assert loaded.genetic_code == MATRIX.genetic_code
+    # the read-only memory map can't be written to
+    assert not loaded.counts.flags.writeable
+    assert loaded.RSCU() == pytest.approx(MATRIX.RSCU())
+
+    # modes that would write to the archive are refused, and copy-on-write
+    # leaves the file as it was
+    for mmap_mode in ("r+", "w+"):
+        with pytest.raises(ValueError):
+            CodonCountMatrix.load(path, mmap_mode=mmap_mode)
+    loaded = CodonCountMatrix.load(path, mmap_mode="c")
+    loaded.counts[0, 0] += 1
+    assert (CodonCountMatrix.load(path).counts == MATRIX.counts).all()
+
+    # the file is written to the path as given, whatever its suffix
+    for name in ("counts", "counts.bin"):
+        path = tmp_path / name
+        MATRIX.save(path)
+        assert (CodonCountMatrix.load(path).counts == MATRIX.counts).all()
+    assert not (tmp_path / "counts.bin.npz").exists()
+
+    other = str(tmp_path / "other.npz")
+    np.savez(other, counts=MATRIX.counts)
+    for path in (other, ECOLI):
+        with pytest.raises(ValueError):
+            CodonCountMatrix.load(path)
+
+
+def test_jobs():
+    parallel = CodonCountMatrix.from_fasta(ECOLI, n_jobs=2)
+    assert (parallel.counts == MATRIX.counts).all()
+    assert list(parallel.ids) == IDS
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        CodonCountMatrix.from_sequences(["ATGAA"])
+    with pytest.raises(ValueError):
+        CodonCountMatrix(np.zeros((2, 10)))
+    with pytest.raises(ValueError):
+        CodonCountMatrix(np.zeros((2, 64)), ids=["a"])
+    with pytest.raises(KeyError):
+        CodonCountMatrix.from_sequences(["AAAAAC"]).CAI(weights={"AAA": 1.0})
+
+
+def test_refine_reference():
+    # the same refinement done the slow way, rescoring every sequence
+    selected = list(range(20))
+    for _ in range(20):
+        scores = CAI_batch(SEQUENCES, reference=[SEQUENCES[i] for i in selected])
+        chosen = sorted(np.argsort(-scores, kind="stable")[:27])
+        if chosen == selected:
+            break
+        selected = chosen
+
+    refinement = MATRIX.refine_reference(initial=IDS[:20], fraction=0.1)
+    assert refinement.converged
+    assert list(refinement.reference.ids) == [IDS[i] for i in selected]
+    assert refinement.weights.to_dict() == pytest.approx(
+        relative_adaptiveness([SEQUENCES[i] for i in selected])
+    )
+    history = refinement.history
+    assert [step.iteration for step in history] == list(range(1, len(history) + 1))
+    assert all(step.genes == 27 for step in history)
+    assert history[-1].changed == 0 and history[0].changed > 0
+
+
+def test_refine_reference_limits():
+    refinement = MATRIX.refine_reference(max_iterations=1)
+    assert not refinement.converged
+    assert len(refinement.history) == 1
+    assert len(refinement.reference) == 3
+    assert len(MATRIX.refine_reference(fraction=1e-6).reference) == 1
+    with pytest.raises(ValueError):
+        MATRIX.refine_reference(fraction=0)
+    with pytest.raises(ValueError):
+        MATRIX.refine_reference(max_iterations=0)
@@ -0,0 +1,104 @@
+from CAI import (
+    RSCU,
+    CAI,
+    CAI_batch,
+    IncrementalCAI,
+    RSCUAccumulator,
+    Weights,
+    codon_indices,
+    optimize,
+)
+from CAI.CAI import _as_bytes, _encode, _CODONS, _INVALID
+from Bio.Seq import Seq
+import array
+import mmap
+import numpy as np
+import pytest
+
+
+def test_codon_indices():
+    # every codon should be encoded as its position in _CODONS
+    assert list(_encode("".join(_CODONS))) == list(range(64))
+
+
+def test_case_insensitive():
+    assert list(_encode("aacGtt")) == list(_encode("AACGTT"))
+
+
+def test_invalid_codons():
+    # anything that isn't A, C, G, T or U makes the whole codon invalid
+    assert list(_encode("NNNAACARG   ")) == [
+        _INVALID,
+        _CODONS.index("AAC"),
+        _INVALID,
+        _INVALID,
+    ]
+
+
+def test_rna():
+    # U is read as T, in either case
+    assert list(_encode("AUGuuu")) == list(_encode("ATGTTT"))
+    assert CAI("AUGGCU", weights={"GCU": 0.5}) == 0.5
+
+
+def test_buffer_inputs():
+    # str, bytes and uint8 arrays should all be encoded identically
+    expected = list(_encode("ATGAACTAA"))
+    assert list(_encode(b"ATGAACTAA")) == expected
+    assert list(_encode(np.frombuffer(b"ATGAACTAA", dtype=np.uint8))) == expected
+
+
+def buffers(sequence):
+    """Yields the same sequence as each kind of buffer that can be passed in."""
+    data = sequence.encode()
+    yield data
+    yield bytearray(data)
+    yield memoryview(data)
+    yield memoryview(bytes(b for b in data for _ in range(2)))[::2]
+    yield array.array("B", data)
+    yield np.frombuffer(data, dtype=np.uint8)
+    yield np.frombuffer(data, dtype="S1")
+    yield Seq(sequence)
+    buffer = mmap.mmap(-1, len(data))
+    buffer.write(data)
+    yield buffer
+
+
+def test_no_copies():
+    data = bytearray(b"ATGAACTAA")
+    for buffer in (data, memoryview(data), np.frombuffer(data, dtype=np.uint8)):
+        assert np.shares_memory(_as_bytes(buffer), np.frombuffer(data, np.uint8))
+    sequence = Seq("ATGAAC")
+    assert _as_bytes(sequence).base is bytes(sequence)
+
+
+def test_all_buffers():
+    sequence = "ATGAACaagTTTGGGtaa"
+    reference = ["AACAAGAAATTTGGCGGG"]
+    weights = Weights(reference=reference)
+    expected = CAI(sequence, reference=reference)
+    for buffer in buffers(sequence):
+        assert list(_encode(buffer)) == list(_encode(sequence))
+        assert CAI(buffer, reference=reference) == expected
+        assert CAI_batch([buffer, buffer], weights=weights.to_dict())[1] == expected
+        assert IncrementalCAI(buffer, weights=weights).cai == expected
+        assert codon_indices([buffer], weights=weights).CAI[0] == expected
+    for buffer in buffers(reference[0]):
+        assert RSCU([buffer]) == RSCU(reference)
+        assert RSCUAccumulator([buffer]).finalize() == RSCU(reference)
+        assert CAI(sequence, reference=[buffer]) == expected
+
+
+def test_codon_arguments():
+    weights = Weights({b"aac": 1.0, "AAT": 0.5})
+    assert weights.to_dict() == {"AAC": 1.0, "AAT": 0.5}
+    gene = IncrementalCAI("AAT", weights=weights)
+    assert gene.substitute(0, b"AAC") == gene.substitute(0, "aac") == 1.0
+    with pytest.raises(ValueError):
+        gene.substitute(0, b"AAN")
+    assert optimize(b"mn", weights=weights, avoid=[b"ATGAAT"]) == "ATGAAC"
+
+
+def test_incomplete_codon():
+    # trailing nucleotides are ignored
+    assert list(_encode("AACGT")) == [_CODONS.index("AAC")]
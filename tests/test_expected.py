@@ -0,0 +1,58 @@
+from CAI import Weights, expected_CAI, expected_CAI_batch, read_fasta
+import math
+import os
+import pytest
+
+ECOLI = os.path.join(
+    os.path.dirname(__file__), os.pardir, "example_seqs", "ecol.heg.fasta"
+)
+REFERENCE = [sequence for _, sequence in read_fasta(ECOLI)]
+WEIGHTS = Weights(reference=REFERENCE)
+
+
+def test_distribution():
+    # half of the third positions are A, so each codon is AAA or AAG evenly
+    result = expected_CAI(
+        "AAAAAG", weights={"AAA": 1.0, "AAG": 0.5}, simulations=20000, random_state=0
+    )
+    assert result.CAI == pytest.approx(math.sqrt(0.5))
+    assert result.expected == pytest.approx(
+        0.25 + 0.5 * math.sqrt(0.5) + 0.25 * 0.5, abs=0.005
+    )
+    assert result.upper == 1.0
+    assert result.p_value == pytest.approx(0.75, abs=0.01)
+
+
+def test_fixed_composition():
+    # only AAG fits the composition of the gene, so every random gene is the same
+    result = expected_CAI("AAGAAG", weights={"AAA": 1.0, "AAG": 0.5})
+    assert result.expected == result.CAI == pytest.approx(0.5)
+    assert result.std == 0
+    assert math.isnan(result.z_score)
+    assert result.p_value == 1
+
+
+def test_highly_expressed():
+    results = expected_CAI_batch(REFERENCE[:20], weights=WEIGHTS, random_state=1)
+    assert [result.CAI for result in results] == pytest.approx(
+        list(WEIGHTS.score_many(REFERENCE[:20]))
+    )
+    assert all(result.CAI > result.upper for result in results)
+    assert all(result.z_score > 2 for result in results)
+
+
+def test_random_state():
+    first = expected_CAI(REFERENCE[0], weights=WEIGHTS, random_state=2)
+    second = expected_CAI(REFERENCE[0], reference=REFERENCE, random_state=2)
+    assert first == second
+    assert (
+        first == expected_CAI_batch(REFERENCE[:2], weights=WEIGHTS, random_state=2)[0]
+    )
+
+
+def test_invalid():
+    assert all(math.isnan(value) for value in expected_CAI("ATGTGG", weights=WEIGHTS))
+    with pytest.raises(ValueError):
+        expected_CAI("ATGAA", weights=WEIGHTS)
+    with pytest.raises(ValueError):
+        expected_CAI("ATGAAA", weights=WEIGHTS, simulations=0)
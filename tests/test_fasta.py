@@ -0,0 +1,35 @@
+from CAI import CAI, read_fasta
+import numpy as np
+
+
+def read(tmp_path, text):
+    path = tmp_path / "test.fasta"
+    path.write_bytes(text)
+    return [(name, bytes(sequence).decode()) for name, sequence in read_fasta(path)]
+
+
+def test_single_line(tmp_path):
+    assert read(tmp_path, b">a first\nATGAAC\n>b\nAAT\n") == [
+        ("a", "ATGAAC"),
+        ("b", "AAT"),
+    ]
+
+
+def test_wrapped(tmp_path):
+    assert read(tmp_path, b">a\nATG\nAAC\n\n>b\r\nAA T\r\nTAA\r\n") == [
+        ("a", "ATGAAC"),
+        ("b", "AATTAA"),
+    ]
+
+
+def test_edge_cases(tmp_path):
+    assert read(tmp_path, b"") == []
+    assert read(tmp_path, b"ignored\n>a\n>b>c\nAAC") == [("a", ""), ("b>c", "AAC")]
+
+
+def test_zero_copy(tmp_path):
+    path = tmp_path / "test.fasta"
+    path.write_bytes(b">a\nATGAAC\n")
+    ((_, sequence),) = read_fasta(path)
+    assert isinstance(sequence, np.ndarray) and sequence.base is not None
+    assert CAI(sequence, reference=["AAC"]) == 1.0
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+
+def test_lazy_imports():
+    # importing CAI shouldn't pull in scipy or build any codon tables
+    check = (
+        "import sys, CAI\n"
+        "from CAI.CAI import _codon_tables, _synonymous_codons\n"
+        "assert 'scipy.stats' not in sys.modules\n"
+        "assert 'Bio.Data.CodonTable' not in sys.modules\n"
+        "assert not _codon_tables and not _synonymous_codons\n"
+        "CAI.CAI('AAT', reference=['AAC'], genetic_code=4)\n"
+        "assert list(_codon_tables) == [4]\n"
+    )
+    subprocess.run([sys.executable, "-c", check], check=True)
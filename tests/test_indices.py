@@ -0,0 +1,93 @@
+from CAI import Weights, codon_indices, read_fasta
+from CAI.CAI import _synonymous_codons
+import math
+import os
+import pytest
+
+ECOLI = os.path.join(
+    os.path.dirname(__file__), os.pardir, "example_seqs", "ecol.heg.fasta"
+)
+REFERENCE = [bytes(sequence).decode() for _, sequence in read_fasta(ECOLI)]
+WEIGHTS = Weights(reference=REFERENCE)
+SYNONYMOUS = _synonymous_codons[11]
+
+
+def codons(sequence):
+    return [sequence[i : i + 3] for i in range(0, len(sequence), 3)]
+
+
+def ENC(sequence):
+    # the effective number of codons straight from Wright (1990)
+    amino_acids = {}
+    for codon in codons(sequence):
+        if codon in SYNONYMOUS:
+            amino_acids.setdefault(tuple(sorted(SYNONYMOUS[codon])), []).append(codon)
+    F = {}
+    for synonyms, used in amino_acids.items():
+        n = len(used)
+        if len(synonyms) > 1 and n > 1:
+            homozygosity = sum((used.count(c) / n) ** 2 for c in synonyms)
+            F.setdefault(len(synonyms), []).append((n * homozygosity - 1) / (n - 1))
+    F = {size: sum(values) / len(values) for size, values in F.items()}
+    if 3 not in F:
+        F[3] = (F[2] + F[4]) / 2
+    return min(2 + 9 / F[2] + 1 / F[3] + 5 / F[4] + 3 / F[6], 61)
+
+
+def test_indices():
+    indices = codon_indices(REFERENCE, weights=WEIGHTS)
+    weights = WEIGHTS.to_dict()
+    optimal = {
+        codon
+        for codon in SYNONYMOUS
+        if len(SYNONYMOUS[codon]) > 1 and weights[codon] == 1
+    }
+    assert list(indices.CAI) == pytest.approx(list(WEIGHTS.score_many(REFERENCE)))
+    for i, sequence in enumerate(REFERENCE[:50]):
+        counted = [c for c in codons(sequence) if len(SYNONYMOUS.get(c, "")) > 1]
+        fop = sum(c in optimal for c in counted) / len(counted)
+        expected = sum(1 / len(SYNONYMOUS[c]) for c in counted)
+        cbi = (fop * len(counted) - expected) / (len(counted) - expected)
+        gc3 = sum(c[2] in "GC" for c in codons(sequence)) / len(codons(sequence))
+        assert indices.Fop[i] == pytest.approx(fop)
+        assert indices.CBI[i] == pytest.approx(cbi)
+        assert indices.GC3[i] == pytest.approx(gc3)
+        try:
+            assert indices.ENC[i] == pytest.approx(ENC(sequence))
+        except KeyError:  # a missing degeneracy class
+            assert math.isnan(indices.ENC[i])
+
+
+def test_extremes():
+    # every amino acid with a single codon, then every codon equally often
+    biased = "".join(sorted(SYNONYMOUS[c])[0] for c in sorted(SYNONYMOUS)) * 4
+    even = "".join(sorted(SYNONYMOUS)) * 4
+    indices = codon_indices([biased, even], weights=WEIGHTS)
+    assert indices.ENC[0] == pytest.approx(20)
+    assert indices.ENC[1] == 61
+
+
+def test_optimal_codons():
+    indices = codon_indices(
+        ["AAAAAGAAGTTT"], weights=WEIGHTS, optimal_codons=["aag", "ATG"]
+    )
+    # only lysine has an optimal codon, ATG has no synonyms
+    assert indices.Fop[0] == pytest.approx(2 / 3)
+    assert indices.CBI[0] == pytest.approx((2 - 1.5) / (3 - 1.5))
+
+
+def test_jobs():
+    serial = codon_indices(REFERENCE, reference=REFERENCE)
+    parallel = codon_indices(iter(REFERENCE), weights=WEIGHTS, n_jobs=2)
+    for a, b in zip(serial, parallel):
+        assert list(a) == pytest.approx(list(b), nan_ok=True)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        codon_indices(["ATGAA"], weights=WEIGHTS)
+    with pytest.raises(ValueError):
+        codon_indices([""], weights=WEIGHTS)
+    with pytest.raises(KeyError):
+        codon_indices(["AAA", "AAAAAC"], weights={"AAA": 1.0, "AAG": 0.5})
+    assert all(len(index) == 0 for index in codon_indices([], weights=WEIGHTS))
@@ -0,0 +1,64 @@
+from CAI import RSCU, Weights, Profiler, profiler, profiling, read_fasta
+from CAI.cli import cli
+from click.testing import CliRunner
+import os
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, "example_seqs")
+ECOLI = os.path.join(EXAMPLES, "ecol.heg.fasta")
+REFERENCE = [sequence for _, sequence in read_fasta(ECOLI)]
+
+
+def test_stages():
+    with profiling() as p:
+        weights = Weights(reference=REFERENCE)
+        weights.score_many(REFERENCE)
+    stats = p.stats()
+    codons = sum(len(sequence) // 3 for sequence in REFERENCE)
+    assert stats["codon counting"].sequences == len(REFERENCE)
+    assert stats["codon counting"].codons == codons
+    assert stats["scoring"] == (1, stats["scoring"].seconds, len(REFERENCE), codons)
+    assert all(stage.seconds >= 0 for stage in stats.values())
+    assert not profiler.enabled
+
+
+def test_disabled():
+    profiler.reset()
+    RSCU(REFERENCE)
+    assert profiler.stats() == {}
+
+
+def test_profiling_resets():
+    with profiling():
+        RSCU(REFERENCE)
+    with profiling() as p:
+        list(read_fasta(ECOLI))
+    assert list(p.stats()) == ["reading FASTA"]
+    assert p.stats()["reading FASTA"].sequences == len(REFERENCE)
+
+
+def test_report():
+    p = Profiler()
+    p.enable()
+    with p.stage("scoring", sequences=2) as stage:
+        stage.count(codons=300)
+    p.record("scoring", 0.5, sequences=1, codons=100)
+    assert p.stats()["scoring"].calls == 2
+    assert p.stats()["scoring"].codons == 400
+    lines = p.report().splitlines()
+    assert lines[0].split() == ["stage", "calls", "seconds", "sequences", "codons"]
+    assert lines[1].split()[1:] == ["2", lines[1].split()[2], "3", "400"]
+
+
+def test_cli(tmp_path):
+    output = str(tmp_path / "scores.tsv")
+    result = CliRunner().invoke(
+        cli, ["score", "-s", ECOLI, "-r", ECOLI, "-o", output, "--profile"]
+    )
+    assert result.exit_code == 0
+    with open(output) as f:
+        assert f.readline() == "id\tlength\tcodons\tCAI\n"
+    # the report is all that goes to the terminal
+    assert result.output.splitlines()[0].split()[0] == "stage"
+    assert "codon counting" in result.output
+    assert "scoring" in result.output
+    assert not profiler.enabled
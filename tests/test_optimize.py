@@ -0,0 +1,112 @@
+from CAI import Weights, optimize, optimize_many, read_fasta
+from Bio.Seq import Seq
+from Bio.Data.CodonTable import unambiguous_dna_by_id
+from itertools import product
+import os
+import re
+import pytest
+
+ECOLI = os.path.join(
+    os.path.dirname(__file__), os.pardir, "example_seqs", "ecol.heg.fasta"
+)
+WEIGHTS = Weights(reference=[sequence for _, sequence in read_fasta(ECOLI)])
+PROTEINS = [
+    str(Seq(bytes(sequence).decode()).translate())
+    for _, sequence in list(read_fasta(ECOLI))[:5]
+]
+CONSTRAINTS = dict(
+    gc_content=(0.35, 0.65), avoid=["GAATTC", "GGATCC"], max_homopolymer=4
+)
+
+
+def translate(sequence):
+    return str(Seq(sequence).translate())
+
+
+def satisfies(sequence, gc_content, avoid, max_homopolymer, gc_window=50):
+    if re.search("|".join(avoid), sequence) or re.search(
+        "|".join(str(Seq(site).reverse_complement()) for site in avoid), sequence
+    ):
+        return False
+    if re.search(r"(.)\1{%d}" % max_homopolymer, sequence):
+        return False
+    windows = [
+        sequence[i : i + gc_window] for i in range(len(sequence) - gc_window + 1)
+    ] or [sequence]
+    return all(
+        gc_content[0] <= (w.count("G") + w.count("C")) / len(w) <= gc_content[1]
+        for w in windows
+    )
+
+
+def test_unconstrained():
+    for protein in PROTEINS:
+        sequence = optimize(protein, weights=WEIGHTS)
+        assert translate(sequence) == protein
+        assert WEIGHTS.score(sequence) == 1
+
+
+def test_constraints():
+    for protein in PROTEINS:
+        sequence = optimize(protein, weights=WEIGHTS, **CONSTRAINTS)
+        assert translate(sequence) == protein
+        assert satisfies(sequence, **CONSTRAINTS)
+        assert WEIGHTS.score(sequence) > 0.9
+
+
+def test_best():
+    # compare against every possible coding sequence of a short protein
+    protein = "MKKFGNLEF"
+    constraints = dict(gc_content=(0.3, 0.5), avoid=["GAATTC"], max_homopolymer=3)
+    table = unambiguous_dna_by_id[11].forward_table
+    codons = [
+        [c for c, a in table.items() if a == amino_acid] for amino_acid in protein
+    ]
+    best = max(
+        WEIGHTS.score("".join(sequence))
+        for sequence in product(*codons)
+        if satisfies("".join(sequence), gc_window=50, **constraints)
+    )
+    sequence = optimize(protein, weights=WEIGHTS, **constraints)
+    assert satisfies(sequence, **constraints)
+    assert WEIGHTS.score(sequence) == pytest.approx(best)
+
+
+def test_shorter_than_gc_window():
+    # the whole of a protein shorter than the window has to be in range
+    constraints = dict(gc_content=(0.4, 0.6), gc_window=30)
+    for beam_width in (32, 256):
+        sequence = optimize(
+            "AAVAPHQA", weights=WEIGHTS, beam_width=beam_width, **constraints
+        )
+        assert translate(sequence) == "AAVAPHQA"
+        assert 0.4 <= (sequence.count("G") + sequence.count("C")) / 24 <= 0.6
+
+
+def test_impossible():
+    with pytest.raises(ValueError):
+        optimize("MM", weights=WEIGHTS, avoid=["ATG"])
+    with pytest.raises(ValueError):
+        optimize("KKK", weights=WEIGHTS, gc_content=(0.5, 1))
+    with pytest.raises(ValueError):
+        optimize("KKK", weights=WEIGHTS, max_homopolymer=1)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        optimize("MBK", weights=WEIGHTS)
+    with pytest.raises(ValueError):
+        optimize("MK", weights=WEIGHTS, avoid=["GANTC"])
+    with pytest.raises(ValueError):
+        optimize("MK", weights=WEIGHTS, beam_width=0)
+    with pytest.raises(ValueError):
+        optimize("MK", weights=WEIGHTS, max_homopolymer=0)
+
+
+def test_many():
+    expected = [optimize(p, weights=WEIGHTS, **CONSTRAINTS) for p in PROTEINS]
+    assert optimize_many(PROTEINS, weights=WEIGHTS, **CONSTRAINTS) == expected
+    assert (
+        optimize_many(iter(PROTEINS), weights=WEIGHTS, n_jobs=2, **CONSTRAINTS)
+        == expected
+    )
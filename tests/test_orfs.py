@@ -0,0 +1,122 @@
+from CAI import CAI, ORF, relative_adaptiveness, scan_orfs
+from CAI.cli import cli
+from Bio.Seq import Seq
+from click.testing import CliRunner
+import random
+import pytest
+
+random.seed(42)
+REFERENCE = "".join(random.choice("ACGT") for _ in range(3000))
+CONTIG = "".join(random.choice("ACGT") for _ in range(20000))
+WEIGHTS = relative_adaptiveness(sequences=[REFERENCE])
+
+
+def orf_sequence(contig, orf):
+    sequence = contig[orf.start : orf.end]
+    if orf.strand == "-":
+        sequence = str(Seq(sequence).reverse_complement())
+    return sequence
+
+
+def test_scan():
+    orfs = list(scan_orfs([("contig", CONTIG)], weights=WEIGHTS, min_codons=30))
+    assert orfs
+    assert {orf.strand for orf in orfs} == {"+", "-"}
+    assert [orf.start for orf in orfs] == sorted(orf.start for orf in orfs)
+    for orf in orfs:
+        assert isinstance(orf, ORF)
+        assert orf.contig == "contig"
+        assert orf.codons >= 30
+        sequence = orf_sequence(CONTIG, orf)
+        assert len(sequence) == 3 * orf.codons + 3
+        assert sequence[:3] in ("TTG", "CTG", "ATT", "ATC", "ATA", "ATG", "GTG")
+        codons = [sequence[i : i + 3] for i in range(0, len(sequence), 3)]
+        assert codons[-1] in ("TAA", "TAG", "TGA")
+        assert not {"TAA", "TAG", "TGA"} & set(codons[:-1])
+        assert orf.CAI == pytest.approx(CAI(sequence[:-3], weights=WEIGHTS))
+
+
+def test_start_codons():
+    # the start codon is the first one after the previous stop codon
+    contig = "TAAATGAAACTGAAATAGCCC"
+    assert list(scan_orfs([("c", contig)], weights=WEIGHTS, min_codons=1)) == [
+        ORF("c", "+", 0, 3, 18, 4, CAI("ATGAAACTGAAA", weights=WEIGHTS))
+    ]
+    assert [
+        orf.start
+        for orf in scan_orfs(
+            [("c", contig)], weights=WEIGHTS, min_codons=1, start_codons=["CTG"]
+        )
+    ] == [9]
+    assert list(scan_orfs([("c", contig)], weights=WEIGHTS, min_codons=5)) == []
+
+    # reverse strand ORFs are given in forward strand positions
+    contig = str(Seq(contig).reverse_complement())
+    assert list(scan_orfs([("c", contig)], weights=WEIGHTS, min_codons=1)) == [
+        ORF("c", "-", 0, 3, 18, 4, CAI("ATGAAACTGAAA", weights=WEIGHTS))
+    ]
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        scan_orfs([], weights=WEIGHTS, min_codons=-1)
+    with pytest.raises(KeyError):
+        scan_orfs([], weights=WEIGHTS, start_codons=["NNN"])
+    with pytest.raises(KeyError, match=r"\(c\): Ambiguous codon NNN"):
+        list(scan_orfs([("c", "ATGNNNTAA")], weights=WEIGHTS, min_codons=1))
+    assert (
+        len(
+            list(
+                scan_orfs(
+                    [("c", "ATGNNNTAA")],
+                    weights=WEIGHTS,
+                    min_codons=1,
+                    ambiguous="skip",
+                )
+            )
+        )
+        == 1
+    )
+
+
+def test_cli(tmp_path):
+    contigs = tmp_path / "contigs.fasta"
+    contigs.write_text(">one\n{}\n>two\n{}\n".format(CONTIG[:10000], CONTIG[10000:]))
+    reference = tmp_path / "reference.fasta"
+    reference.write_text(">reference\n{}\n".format(REFERENCE))
+
+    arguments = ["scan", "-s", str(contigs), "-r", str(reference), "--min-codons", "50"]
+    result = CliRunner().invoke(cli, arguments)
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0] == "id\tstrand\tframe\tstart\tend\tcodons\tCAI"
+
+    expected = list(
+        scan_orfs(
+            [("one", CONTIG[:10000]), ("two", CONTIG[10000:])],
+            weights=WEIGHTS,
+            min_codons=50,
+        )
+    )
+    assert len(lines) == len(expected) + 1
+    for line, orf in zip(lines[1:], expected):
+        fields = line.split("\t")
+        assert fields[:6] == [
+            orf.contig,
+            orf.strand,
+            str(orf.frame),
+            str(orf.start + 1),
+            str(orf.end),
+            str(orf.codons),
+        ]
+        assert float(fields[6]) == pytest.approx(orf.CAI)
+
+    parallel = CliRunner().invoke(cli, arguments + ["--jobs", "2"])
+    assert parallel.exit_code == 0
+    assert parallel.output == result.output
+
+    # an ORF with an ambiguous codon stops the scan, saying which contig it is on
+    contigs.write_text(">one\nATGNNNTAA\n")
+    result = CliRunner().invoke(cli, arguments[:-2] + ["--min-codons", "1"])
+    assert result.exit_code == 1
+    assert "(one): Ambiguous codon NNN" in result.output
@@ -0,0 +1,31 @@
+from CAI import CAI_batch, RSCU, Weights
+from CAI._parallel import map_chunks
+import pytest
+
+SEQUENCES = ["AAC", "ATC", "AACGATACGGCACGT", "AATTAA", "ATG"] * 7
+
+
+def test_rscu():
+    assert RSCU(SEQUENCES, n_jobs=2) == RSCU(SEQUENCES)
+    assert RSCU([], n_jobs=2) == RSCU([])
+
+
+def test_cai_batch():
+    weights = Weights(reference=["AACCTGTTCAAG"])
+    result = CAI_batch(SEQUENCES, reference=["AACCTGTTCAAG"], n_jobs=2)
+    assert list(result) == pytest.approx(
+        list(weights.score_many(SEQUENCES)), nan_ok=True
+    )
+    assert len(weights.score_many([], n_jobs=2)) == 0
+
+
+def test_chunk_order():
+    chunks = map_chunks(sum, iter(range(100)), n_jobs=2, chunksize=3)
+    assert list(chunks) == [sum(range(i, min(i + 3, 100))) for i in range(0, 100, 3)]
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        RSCU(SEQUENCES, n_jobs=0)
+    with pytest.raises(KeyError):
+        CAI_batch(["AAC", "NNN"], reference=["AAC"], n_jobs=2)
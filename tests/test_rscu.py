@@ -97,3 +97,38 @@ def test_multiple_seqs():
 def test_stop_codon():
     # stop codons should be equivalent to an empty string since they don't have RSCUs
     assert RSCU(["TAA"]) == RSCU(["TAG"]) == RSCU(["   "])
+
+
+def test_invalid_records():
+    from CAI import InvalidSequenceError
+    import pickle
+
+    sequences = ["AAC", "AACG", "ATC", ""]
+    for n_jobs in (1, 2):
+        with pytest.raises(InvalidSequenceError) as error:
+            RSCU(sequences, ids=["a", "b", "c", "d"], n_jobs=n_jobs)
+        assert (error.value.index, error.value.id) == (1, "b")
+        assert (
+            str(error.value) == "Sequence 1 (b): Input sequence not divisible by three"
+        )
+
+        # or leave them out and count them
+        with pytest.warns(UserWarning, match="Skipped 2 invalid sequences"):
+            assert RSCU(sequences, invalid="skip", n_jobs=n_jobs) == RSCU(
+                ["AAC", "ATC"]
+            )
+
+    # errors keep their details when sent between processes
+    error = pickle.loads(pickle.dumps(error.value))
+    assert (error.reason, error.index, error.id) == (
+        "Input sequence not divisible by three",
+        1,
+        "b",
+    )
+
+    with pytest.raises(InvalidSequenceError, match="Sequence 1 .b.: Ambiguous"):
+        RSCU(["AAC", "NNN"], ids=["a", "b"], ambiguous="error")
+    with pytest.raises(ValueError):
+        RSCU(["AAC"], ids=[])
+    with pytest.raises(ValueError):
+        RSCU(["AAC"], invalid="ignore")
@@ -0,0 +1,35 @@
+from CAI import RSCU, RSCUAccumulator
+import pytest
+
+
+def test_matches_rscu():
+    sequences = ["AAC", "ATC", "AACGATACGGCACGT", "aagTAA"]
+    assert RSCUAccumulator(sequences).finalize() == RSCU(sequences)
+    assert RSCUAccumulator().finalize() == RSCU([])
+    assert RSCUAccumulator(["AAC"], genetic_code=10).finalize() == RSCU(
+        ["AAC"], genetic_code=10
+    )
+
+
+def test_streaming():
+    accumulator = RSCUAccumulator()
+    accumulator.add("AAC")
+    accumulator.update(iter(["ATC", "AACGATACGGCACGT"]))
+    assert accumulator.finalize() == RSCU(["AAC", "ATC", "AACGATACGGCACGT"])
+    assert accumulator.counts.sum() == 7
+
+
+def test_merge():
+    first, second = RSCUAccumulator(["AAC"]), RSCUAccumulator(["ATCAAT"])
+    assert first.merge(second) is first
+    assert first.finalize() == RSCU(["AAC", "ATCAAT"])
+    assert second.finalize() == RSCU(["ATCAAT"])
+    with pytest.raises(ValueError):
+        first.merge(RSCUAccumulator(genetic_code=4))
+
+
+def test_bad_sequences():
+    with pytest.raises(ValueError):
+        RSCUAccumulator(["AA"])
+    with pytest.raises(ValueError):
+        RSCUAccumulator().add("")
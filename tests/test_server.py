@@ -0,0 +1,151 @@
+from CAI import Weights, read_fasta
+from CAI.cli import cli
+from CAI.server import ScoringServer, _HTTPError
+from click.testing import CliRunner
+from http.client import HTTPConnection
+import asyncio
+import json
+import os
+import socket
+import threading
+import pytest
+
+ECOLI = os.path.join(
+    os.path.dirname(__file__), os.pardir, "example_seqs", "ecol.heg.fasta"
+)
+SEQUENCES = [bytes(sequence).decode() for _, sequence in read_fasta(ECOLI)]
+WEIGHTS = Weights(reference=SEQUENCES)
+
+
+def start(server, **kwargs):
+    """Runs a server in a background thread until the returned function is called."""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = {}
+
+    def ready(listener):
+        address["name"] = listener.sockets[0].getsockname()
+        started.set()
+
+    task = loop.create_task(server.serve(ready=ready, **kwargs))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        loop.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(10)
+
+    def stop():
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(10)
+
+    return address["name"], stop
+
+
+@pytest.fixture
+def port():
+    (_, port), stop = start(
+        ScoringServer({"ecoli": WEIGHTS, "small": {"AAA": 1.0, "AAG": 0.5}}), port=0
+    )
+    yield port
+    stop()
+
+
+def request(connection, method, path, body=None):
+    connection.request(
+        method, path, body=None if body is None else json.dumps(body).encode()
+    )
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_score(port):
+    connection = HTTPConnection("127.0.0.1", port)
+    assert request(connection, "GET", "/weights") == (
+        200,
+        {"ecoli": {"genetic_code": 11}, "small": {"genetic_code": 11}},
+    )
+
+    # several requests over one connection
+    for sequences in (SEQUENCES[:10], SEQUENCES[10:200], []):
+        status, body = request(
+            connection, "POST", "/score/ecoli", {"sequences": sequences}
+        )
+        assert status == 200
+        assert body["CAI"] == pytest.approx(list(WEIGHTS.score_many(sequences)))
+
+    status, body = request(
+        connection, "POST", "/score/small", {"sequences": ["AAAAAG", "ATG"]}
+    )
+    assert body == {"CAI": [pytest.approx(0.5**0.5), None]}
+
+
+def test_errors(port):
+    connection = HTTPConnection("127.0.0.1", port)
+    status, body = request(connection, "POST", "/score/ecoli", {"sequences": ["AT"]})
+    assert status == 400 and "divisible by three" in body["error"]
+    status, body = request(connection, "POST", "/score/small", {"sequences": ["AAC"]})
+    assert status == 400 and "AAC" in body["error"]
+    assert request(connection, "POST", "/score/other", {"sequences": []})[0] == 404
+    assert request(connection, "POST", "/score/ecoli", {"genes": []})[0] == 400
+    assert request(connection, "POST", "/score/ecoli", {"sequences": [1]})[0] == 400
+    assert request(connection, "GET", "/score/ecoli")[0] == 405
+    assert request(connection, "GET", "/other")[0] == 404
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_unix_socket(tmp_path):
+    path = str(tmp_path / "cai.sock")
+    _, stop = start(ScoringServer({"ecoli": WEIGHTS}), path=path)
+    try:
+        body = json.dumps({"sequences": SEQUENCES[:3]}).encode()
+        client = socket.socket(socket.AF_UNIX)
+        client.connect(path)
+        client.sendall(
+            b"POST /score/ecoli HTTP/1.1\r\nConnection: close\r\n"
+            + b"Content-Length: %d\r\n\r\n" % len(body)
+            + body
+        )
+        response = b""
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            response += data
+        client.close()
+        head, _, payload = response.partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200")
+        assert json.loads(payload)["CAI"] == pytest.approx(
+            list(WEIGHTS.score_many(SEQUENCES[:3]))
+        )
+    finally:
+        stop()
+
+
+def test_full_queue():
+    server = ScoringServer({"ecoli": WEIGHTS}, queue_size=1)
+
+    async def overfill():
+        server._queue = asyncio.Queue(1)
+        server._queue.put_nowait(None)
+        with pytest.raises(_HTTPError) as e:
+            await server._handle("POST", "/score/ecoli", b'{"sequences": []}')
+        assert e.value.status == 503
+
+    asyncio.run(overfill())
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        ScoringServer({})
+    with pytest.raises(ValueError):
+        ScoringServer({"ecoli": WEIGHTS}, queue_size=0)
+    result = CliRunner().invoke(cli, ["serve"])
+    assert result.exit_code == 2
+    result = CliRunner().invoke(cli, ["serve", "-r", ECOLI])
+    assert result.exit_code == 2
@@ -0,0 +1,60 @@
+from CAI import CAI, IncrementalCAI, Weights
+import pytest
+import math
+from CAI.CAI import _synonymous_codons
+
+REFERENCE = ["AACCTGTTCAAGGGTTAAATG"]
+GENE = "ATGAATCTATTTAAAGGGAACTGGCTGTAA"
+
+
+def test_cai():
+    gene = IncrementalCAI(GENE, reference=REFERENCE)
+    assert len(gene) == 10
+    assert gene.sequence == GENE
+    assert gene.cai == pytest.approx(CAI(GENE, reference=REFERENCE))
+
+
+def test_substitute():
+    gene = IncrementalCAI(GENE, reference=REFERENCE)
+    for position in range(len(gene)):
+        for codon in ["AAC", "CTG", "CTA", "ATG", "TAA", "ggt"]:
+            variant = GENE[: 3 * position] + codon.upper() + GENE[3 * position + 3 :]
+            expected = CAI(variant, reference=REFERENCE)
+            assert gene.substitute(position, codon) == pytest.approx(
+                expected, nan_ok=True
+            )
+    # the gene itself doesn't change
+    assert gene.sequence == GENE
+    with pytest.raises(ValueError):
+        gene.substitute(0, "NNN")
+
+
+def test_apply():
+    gene = IncrementalCAI(GENE, weights=Weights(reference=REFERENCE))
+    gene.apply(1, "AAC")
+    gene.apply(2, "CTG")
+    expected = "ATGAACCTGTTTAAAGGGAACTGGCTGTAA"
+    assert gene.sequence == expected
+    assert gene.cai == pytest.approx(CAI(expected, reference=REFERENCE))
+
+
+def test_zero_weights():
+    gene = IncrementalCAI("AACAAC", weights={"AAC": 1.0, "AAT": 0.0})
+    assert gene.substitute(0, "AAT") == 0
+    assert gene.apply(0, "AAT") == 0
+    assert gene.apply(0, "AAC") == 1
+
+
+def test_synonymous_scan():
+    gene = IncrementalCAI(GENE, reference=REFERENCE)
+    scan = gene.synonymous_scan()
+    assert scan.shape == (10, 64)
+    for position in range(len(gene)):
+        current = GENE[3 * position : 3 * position + 3]
+        for column, codon in enumerate(gene.codons):
+            if codon in _synonymous_codons[11].get(current, []):
+                variant = GENE[: 3 * position] + codon + GENE[3 * position + 3 :]
+                expected = CAI(variant, reference=REFERENCE)
+                assert scan[position, column] == pytest.approx(expected, nan_ok=True)
+            else:
+                assert math.isnan(scan[position, column])
@@ -0,0 +1,99 @@
+from CAI import CAI, CAI_batch, RSCU, Weights, relative_adaptiveness
+import pytest
+import pickle
+import math
+
+
+def test_bad_args():
+    with pytest.raises(TypeError):
+        Weights()
+    with pytest.raises(TypeError):
+        Weights(reference=["AAC"], RSCUs=RSCU(["AAC"]))
+
+
+def test_arg_equivalence():
+    assert (
+        Weights(reference=["AAC"]).to_dict()
+        == Weights(RSCUs=RSCU(["AAC"])).to_dict()
+        == Weights(relative_adaptiveness(sequences=["AAC"])).to_dict()
+        == relative_adaptiveness(sequences=["AAC"])
+    )
+
+
+def test_score():
+    weights = Weights(reference=["AACCTGTTCAAG"])
+    for sequence in ["AAT", "AATTAA", "CTGCTATTTAAAGGG" * 7]:
+        assert weights.score(sequence) == CAI(sequence, reference=["AACCTGTTCAAG"])
+    assert math.isnan(weights.score("ATG"))
+    with pytest.raises(ValueError):
+        weights.score("AA")
+    with pytest.raises(KeyError):
+        weights.score("NNN")
+
+
+def test_score_many():
+    sequences = ["AAT", "AAC", "AATAAC"]
+    assert list(Weights(reference=["AAC"]).score_many(sequences)) == list(
+        CAI_batch(sequences, reference=["AAC"])
+    )
+
+
+def test_immutable():
+    weights = Weights(reference=["AAC"])
+    with pytest.raises(AttributeError):
+        weights.genetic_code = 4
+    with pytest.raises(AttributeError):
+        weights.other = 1
+    with pytest.raises(ValueError):
+        weights._log_weights[0] = 0
+
+
+def test_pickle():
+    weights = Weights(reference=["AAC"], genetic_code=10)
+    unpickled = pickle.loads(pickle.dumps(weights))
+    assert unpickled.genetic_code == 10
+    assert unpickled.to_dict() == weights.to_dict()
+    assert unpickled.score("AATTGA") == weights.score("AATTGA")
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "weights.json")
+    weights = Weights(reference=["AACCTGTTCAAG"], genetic_code=10)
+    weights.save(path, reference="test")
+    loaded = Weights.load(path)
+    assert loaded.genetic_code == 10
+    assert loaded.to_dict() == weights.to_dict()
+    assert loaded.score("AATTGACTA") == weights.score("AATTGACTA")
+
+
+def test_load_bad_file(tmp_path):
+    path = tmp_path / "weights.json"
+    path.write_text("ATG")
+    with pytest.raises(ValueError):
+        Weights.load(str(path))
+    path.write_text('{"format": "CAI weights", "version": 1000}')
+    with pytest.raises(ValueError, match="newer version"):
+        Weights.load(str(path))
+
+    # the right format without the fields that go with it
+    for fields in ('"version": 1', '"version": 1, "weights": {}', '"weights": {}'):
+        path.write_text('{"format": "CAI weights", ' + fields + "}")
+        with pytest.raises(ValueError, match="not a CAI weights file"):
+            Weights.load(str(path))
+
+
+def test_weights_object():
+    from CAI import CAI_profile
+
+    weights = Weights(reference=["AACCTGTTCAAG"], genetic_code=4)
+    assert Weights(weights).to_dict() == weights.to_dict()
+    assert Weights(weights, genetic_code=11).genetic_code == 4
+    with pytest.raises(TypeError):
+        Weights(weights, reference=["AAC"])
+
+    sequence = "AATCTGCTA"
+    assert CAI(sequence, weights=weights) == weights.score(sequence)
+    assert list(CAI_batch([sequence], weights=weights)) == [weights.score(sequence)]
+    assert list(CAI_profile(sequence, weights=weights, window=2)) == list(
+        weights.profile(sequence, window=2)
+    )